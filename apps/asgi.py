@@ -3,14 +3,30 @@ ASGI config for apps project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests served here resolve against ``apps.asgi_urls``, which runs login and registration on a bounded
+password-hashing pool instead of the request threads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apps.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'apps.asgi_urls'
+
+
+class OffloadingASGIHandler(ASGIHandler):
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = OffloadingASGIHandler()
@@ -0,0 +1,17 @@
+"""
+URL configuration for the ASGI entry point.
+
+Password-hashing endpoints are served by async views backed by a bounded pool (see ``users.offload``); every
+other route is the regular ``apps.urls`` configuration.
+"""
+from django.urls import path
+
+from users.offload import offload
+from users.views import LoginView, RegisterView
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('auth/register', offload(RegisterView.as_view()), name='register'),
+    path('auth/login', offload(LoginView.as_view()), name='login'),
+    *sync_urlpatterns,
+]
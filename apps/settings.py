@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'trello.middleware.RequestMetricsMiddleware',
+    'trello.middleware.ProfilingMiddleware',
+    'trello.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,11 +83,49 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'trello.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'trello.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'trello.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+TRELLO_MAX_PAGE_SIZE = 200
+
+# Change feed cursors stay this many seconds behind the log; purge_board_changes keeps this many days of it.
+TRELLO_CHANGES_CURSOR_MARGIN = 60
+TRELLO_CHANGES_RETENTION_DAYS = 30
+
+# JSON responses holding this many list items are streamed; bodies smaller than this many bytes are not
+# compressed. Install orjson and brotli for faster encoding and brotli compression (see trello.renderers).
+TRELLO_STREAM_MIN_ITEMS = 200
+TRELLO_COMPRESSION_MIN_SIZE = 1024
+
+TRELLO_SLOW_REQUEST_MS = 500
+TRELLO_SLOW_REQUEST_QUERIES = 50
+
+# Fraction of requests to profile, optionally limited to route names such as 'card-list' (see trello.profiling).
+TRELLO_PROFILING = {
+    'SAMPLE_RATE': env.float('TRELLO_PROFILE_SAMPLE_RATE', default=0.0),
+    'ROUTES': env.list('TRELLO_PROFILE_ROUTES', default=[]),
+}
+
+TRELLO_EVENT_LAYER = {
+    'BACKEND': 'trello.events.InMemoryEventLayer',
+    'OPTIONS': {
+        'queue_size': 100,
+    },
 }
 
 SIMPLE_JWT = {
@@ -98,6 +139,7 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
 }
 
 WSGI_APPLICATION = 'apps.wsgi.application'
@@ -105,20 +147,45 @@ WSGI_APPLICATION = 'apps.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': env('PGDATABASE'),
-        'USER': env('PGUSER'),
-        'PASSWORD': env('PGPASSWORD'),
-        'HOST': env('PGHOST'),
-        'PORT': 5432,
-        'OPTIONS': {
-            'sslmode': 'require',
-        },
+# DATABASE_URL (for example sqlite:///db.sqlite3 for local runs and benchmarks) overrides the Postgres settings.
+if env('DATABASE_URL', default=None):
+    DATABASES = {
+        'default': env.db('DATABASE_URL'),
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('PGDATABASE'),
+            'USER': env('PGUSER'),
+            'PASSWORD': env('PGPASSWORD'),
+            'HOST': env('PGHOST'),
+            'PORT': 5432,
+            'OPTIONS': {
+                'sslmode': 'require',
+            },
+        }
     }
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://trello'),
 }
 
+TRELLO_MEMBERSHIP_CACHE_TIMEOUT = 300
+TRELLO_RESPONSE_CACHE_TIMEOUT = 300
+USER_CACHE_TIMEOUT = 60
+BLACKLIST_FILTER_MAX_AGE = 300
+BLACKLIST_CATCH_UP_MARGIN = 60
+# The refresh token blacklist filter is only used with a shared cache unless forced on or off (see users.blacklist).
+BLACKLIST_FILTER = env.bool('BLACKLIST_FILTER', default=None)
+
+# Login and registration hash passwords on a dedicated pool under ASGI (see users.offload).
+AUTH_HASHING_WORKERS = env.int('AUTH_HASHING_WORKERS', default=4)
+AUTH_HASHING_QUEUE_DEPTH = env.int('AUTH_HASHING_QUEUE_DEPTH', default=32)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -154,6 +221,20 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Media files (card attachments)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+TRELLO_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'uploads')
+TRELLO_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+TRELLO_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Hand attachment downloads to the front proxy: None, 'x-accel-redirect' (nginx, internal location mapped to
+# MEDIA_ROOT at TRELLO_DOWNLOAD_ACCEL_PREFIX) or 'x-sendfile'.
+TRELLO_DOWNLOAD_OFFLOAD = env('TRELLO_DOWNLOAD_OFFLOAD', default=None)
+TRELLO_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
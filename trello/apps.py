@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class TrelloConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trello'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_recorder
+        from .search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
+        connection_created.connect(install_query_recorder)
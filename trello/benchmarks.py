@@ -0,0 +1,353 @@
+"""
+Scale fixtures and an endpoint benchmark harness.
+
+``generate_scale_data`` fills the database with users, boards, lists, cards, members, comments and tags using
+``bulk_create``. ``run_benchmarks`` drives every ``/api/`` and ``/auth/`` endpoint through the DRF test client
+and reports latency percentiles, query counts and peak traced memory per endpoint, read with the response
+cache bypassed and, for reads, warm as well; ``compare_to_baseline``
+turns a stored report into regression failures. Query counts are compared exactly, timings and memory with a
+tolerance since they depend on the machine. ``benchmark_serializers`` compares the per-row CPU cost of the model
+serializers against the ``values()`` row serializers that serve list endpoints, and ``benchmark_encoding`` the
+JSON encoders and response compression on board-sized payloads.
+"""
+import gzip
+import random
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import Board, BoardMember, List, Card, CardMember, CardComment, CardTag
+from .optimizers import optimize_queryset
+from .ranking import spread_keys
+from .renderers import FastJSONRenderer, iter_json
+from .serializers import ListSerializer, CardSerializer, CardCommentSerializer, ListRowSerializer, \
+    CardRowSerializer, CardCommentRowSerializer
+from .snapshots import build_board_snapshot
+from .versioning import bypass_response_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SCALE_USER_EMAIL = 'scale-user-{}@example.com'
+SCALE_PASSWORD = 'benchmark'
+WORDS = ('design', 'review', 'deploy', 'bug', 'refactor', 'launch', 'research', 'copy', 'billing', 'search',
+         'mobile', 'onboarding', 'metrics', 'release', 'support', 'backlog')
+TAGS = ('urgent', 'frontend', 'backend', 'blocked', 'idea', 'chore')
+
+
+def _slug():
+    return str(uuid.uuid4())
+
+
+def _phrase(rng, words=3):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+@transaction.atomic
+def generate_scale_data(users=20, boards=10, lists=8, cards=25, members=5, comments=2, tags=1, seed=0,
+                        batch_size=1000):
+    """
+    Creates ``boards`` boards, each with ``lists`` lists of ``cards`` cards, ``members`` board members and
+    ``comments`` comments and ``tags`` tags per card. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    start = User.objects.count()
+    password = make_password(SCALE_PASSWORD)
+    created_users = User.objects.bulk_create([User(
+        email=SCALE_USER_EMAIL.format(start + index), password=password, slug=_slug(),
+        first_name=rng.choice(('Ada', 'Grace', 'Alan', 'Edsger', 'Barbara')), sur_name=f'User{start + index}',
+    ) for index in range(users)], batch_size=batch_size)
+
+    created_boards = Board.objects.bulk_create([Board(
+        name=_phrase(rng, 2), slug=_slug(), description=_phrase(rng, 8), created_by=created_users[index % users],
+    ) for index in range(boards)], batch_size=batch_size)
+    board_members = []
+    for index, board in enumerate(created_boards):
+        owner = created_users[index % users]
+        others = rng.sample([user for user in created_users if user != owner], min(members - 1, users - 1))
+        board_members.append(BoardMember(board=board, user=owner, is_admin=True))
+        board_members.extend(BoardMember(board=board, user=user) for user in others)
+    BoardMember.objects.bulk_create(board_members, batch_size=batch_size)
+    member_users = {}
+    for member in board_members:
+        member_users.setdefault(member.board_id, []).append(member.user)
+
+    list_positions = spread_keys(lists)
+    created_lists = List.objects.bulk_create([List(
+        board=board, name=_phrase(rng, 1), slug=_slug(), position=position, created_by=board.created_by,
+    ) for board in created_boards for position in list_positions], batch_size=batch_size)
+
+    card_positions = spread_keys(cards)
+    created_cards = Card.objects.bulk_create([Card(
+        list=board_list, board_id=board_list.board_id, name=_phrase(rng), slug=_slug(), position=position,
+        description=_phrase(rng, 12), created_by=rng.choice(member_users[board_list.board_id]),
+    ) for board_list in created_lists for position in card_positions], batch_size=batch_size)
+
+    CardMember.objects.bulk_create([CardMember(card=card, user=card.created_by) for card in created_cards],
+                                   batch_size=batch_size)
+    CardComment.objects.bulk_create([CardComment(
+        card=card, board_id=card.board_id, slug=_slug(), user=rng.choice(member_users[card.board_id]),
+        comment=_phrase(rng, 10),
+    ) for card in created_cards for _ in range(comments)], batch_size=batch_size)
+    CardTag.objects.bulk_create([CardTag(
+        card=card, board_id=card.board_id, slug=_slug(), tag=rng.choice(TAGS),
+    ) for card in created_cards for _ in range(tags)], batch_size=batch_size)
+    return {'users': users, 'boards': boards, 'members': len(board_members), 'lists': len(created_lists),
+            'cards': len(created_cards), 'comments': len(created_cards) * comments,
+            'tags': len(created_cards) * tags}
+
+
+def benchmark_context():
+    """
+    Picks the fixtures endpoints are exercised against: the first scale user and their first board.
+    """
+    membership = BoardMember.objects.filter(user__email__startswith='scale-user-', is_admin=True) \
+        .select_related('user', 'board').order_by('id').first()
+    if membership is None:
+        raise LookupError('No scale data found, run generate_scale_data first.')
+    board, user = membership.board, membership.user
+    card = Card.objects.filter(board=board).order_by('position', 'id').select_related('list').first()
+    return SimpleNamespace(user=user, board=board, list=card.list, card=card)
+
+
+def _fresh_tokens(context):
+    return context.user.tokens()
+
+
+def _register(context):
+    return {'email': f'bench-{uuid.uuid4().hex[:16]}@example.com', 'password': SCALE_PASSWORD,
+            'password2': SCALE_PASSWORD, 'first_name': 'Bench', 'sur_name': 'User'}
+
+
+# (name, method, path, data) where path and data may be callables taking the context; data callables run
+# before the timer starts.
+ENDPOINTS = (
+    ('boards.list', 'get', '/api/boards/', None),
+    ('boards.detail', 'get', lambda c: f'/api/boards/{c.board.slug}/', None),
+    ('boards.snapshot', 'get', lambda c: f'/api/boards/{c.board.slug}/snapshot/', None),
+    ('boards.changes', 'get', lambda c: f'/api/boards/{c.board.slug}/changes/?since=0', None),
+    ('boards.export', 'get', lambda c: f'/api/boards/{c.board.slug}/export/', None),
+    ('lists.list', 'get', '/api/lists/', None),
+    ('lists.detail', 'get', lambda c: f'/api/lists/{c.list.slug}/', None),
+    ('cards.list', 'get', '/api/cards/', None),
+    ('cards.detail', 'get', lambda c: f'/api/cards/{c.card.slug}/', None),
+    ('cards.create', 'post', '/api/cards/', lambda c: {'list': c.list.slug, 'name': 'Benchmark card'}),
+    ('cards.update', 'patch', lambda c: f'/api/cards/{c.card.slug}/', lambda c: {'description': 'Updated'}),
+    ('cards.move', 'post', lambda c: f'/api/cards/{c.card.slug}/move/', lambda c: {'list': c.list.slug}),
+    ('cards.bulk_create', 'post', '/api/cards/bulk/',
+     lambda c: [{'list': c.list.slug, 'name': f'Bulk card {index}'} for index in range(20)]),
+    ('comments.list', 'get', '/api/comments/', None),
+    ('comments.create', 'post', '/api/comments/', lambda c: {'card': c.card.slug, 'comment': 'Benchmark'}),
+    ('tags.list', 'get', '/api/tags/', None),
+    ('attachments.list', 'get', '/api/attachments/', None),
+    ('search', 'get', '/api/search/?q=deploy', None),
+    ('auth.register', 'post', '/auth/register', _register),
+    ('auth.login', 'post', '/auth/login', lambda c: {'email': c.user.email, 'password': SCALE_PASSWORD}),
+    ('auth.token_refresh', 'post', '/auth/token/refresh', lambda c: {'refresh': _fresh_tokens(c)['refresh']}),
+    ('auth.token_check', 'post', '/auth/token/check', lambda c: {'token': _fresh_tokens(c)['access']}),
+    ('auth.logout', 'post', '/auth/logout', lambda c: {'refresh_token': _fresh_tokens(c)['refresh']}),
+)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))]
+
+
+def _request(client, method, path, data):
+    response = getattr(client, method)(path, data, format='json') if data is not None else \
+        getattr(client, method)(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def _timed_requests(client, method, path, prepare, iterations):
+    timings, queries, response = [], 0, None
+    for _ in range(iterations):
+        payload = prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = _request(client, method, path, payload)
+            timings.append(time.perf_counter() - started)
+            queries = max(queries, len(captured))
+    return timings, queries, response
+
+
+def run_benchmarks(iterations=20, warmup=2, names=None):
+    """
+    Returns ``{endpoint: {'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb', 'status'}}``, measured with the
+    response cache bypassed so every read runs its queries and serializers. Reads also report ``warm_p50_ms``
+    and ``warm_queries`` with the cache filled.
+    """
+    context = benchmark_context()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {context.user.tokens()['access']}")
+    anonymous = APIClient()
+    results = {}
+    for name, method, path, data in ENDPOINTS:
+        if names and name not in names:
+            continue
+        endpoint_client = anonymous if name.startswith('auth.') else client
+        resolved_path = path(context) if callable(path) else path
+
+        def prepare():
+            return data(context) if callable(data) else data
+
+        with bypass_response_cache():
+            for _ in range(warmup):
+                _request(endpoint_client, method, resolved_path, prepare())
+            timings, queries, response = _timed_requests(endpoint_client, method, resolved_path, prepare,
+                                                         iterations)
+            payload = prepare()
+            tracemalloc.start()
+            try:
+                _request(endpoint_client, method, resolved_path, payload)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        results[name] = {
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'queries': queries,
+            'peak_kb': round(peak / 1024, 1),
+            'status': response.status_code,
+        }
+        if method == 'get':
+            _request(endpoint_client, method, resolved_path, prepare())
+            warm_timings, warm_queries, _ = _timed_requests(endpoint_client, method, resolved_path, prepare,
+                                                            iterations)
+            results[name].update(warm_p50_ms=round(percentile(warm_timings, 0.5) * 1000, 2),
+                                 warm_queries=warm_queries)
+    return results
+
+
+def compare_to_baseline(results, baseline, time_tolerance=0.5, memory_tolerance=0.5, min_time_ms=5.0):
+    """
+    Returns a list of regression messages for ``results`` against a stored ``baseline`` report.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual['status'] != expected['status']:
+            regressions.append(f"{name}: status {actual['status']} (baseline {expected['status']})")
+        if actual['queries'] > expected['queries']:
+            regressions.append(f"{name}: {actual['queries']} queries (baseline {expected['queries']})")
+        allowed_ms = max(expected['p95_ms'] * (1 + time_tolerance), expected['p95_ms'] + min_time_ms)
+        if actual['p95_ms'] > allowed_ms:
+            regressions.append(f"{name}: p95 {actual['p95_ms']} ms (baseline {expected['p95_ms']} ms)")
+        if actual['peak_kb'] > expected['peak_kb'] * (1 + memory_tolerance):
+            regressions.append(f"{name}: peak {actual['peak_kb']} KB (baseline {expected['peak_kb']} KB)")
+    return regressions
+
+
+SERIALIZER_PAIRS = (
+    ('lists', List, ListSerializer, ListRowSerializer),
+    ('cards', Card, CardSerializer, CardRowSerializer),
+    ('comments', CardComment, CardCommentSerializer, CardCommentRowSerializer),
+)
+
+
+def _serialize(queryset, serializer_class):
+    return serializer_class(optimize_queryset(queryset, serializer_class), many=True).data
+
+
+def benchmark_serializers(limit=1000, repeat=5, names=None):
+    """
+    Returns ``{name: {'rows', 'model_us', 'row_us', 'speedup', 'identical'}}`` where the ``_us`` values are
+    the best per-row CPU time over ``repeat`` runs of fetching and serializing ``limit`` rows, and
+    ``identical`` tells whether both serializers rendered the same JSON bytes.
+    """
+    renderer = JSONRenderer()
+    results = {}
+    for name, model, serializer_class, row_serializer_class in SERIALIZER_PAIRS:
+        if names and name not in names:
+            continue
+        queryset = model.objects.order_by('-id')[:limit]
+        timings = {}
+        for label, serializer in (('model_us', serializer_class), ('row_us', row_serializer_class)):
+            best = None
+            for _ in range(repeat):
+                started = time.process_time()
+                data = _serialize(queryset, serializer)
+                elapsed = time.process_time() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = (best, data)
+        rows = len(timings['row_us'][1])
+        model_time, row_time = timings['model_us'][0], timings['row_us'][0]
+        results[name] = {
+            'rows': rows,
+            'model_us': round(model_time / max(rows, 1) * 1e6, 2),
+            'row_us': round(row_time / max(rows, 1) * 1e6, 2),
+            'speedup': round(model_time / row_time, 2) if row_time else None,
+            'identical': renderer.render(timings['model_us'][1]) == renderer.render(timings['row_us'][1]),
+        }
+    return results
+
+
+def _best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def encoding_payloads(page_size=200):
+    context = benchmark_context()
+    cards = Card.objects.filter(board=context.board).order_by('-id')[:page_size]
+    comments = CardComment.objects.filter(board=context.board).order_by('-id')[:page_size]
+    return {
+        'snapshot': build_board_snapshot(context.board),
+        'cards.page': {'next': None, 'previous': None,
+                       'results': _serialize(cards, CardRowSerializer)},
+        'comments.page': {'next': None, 'previous': None,
+                          'results': _serialize(comments, CardCommentRowSerializer)},
+    }
+
+
+def benchmark_encoding(repeat=20, page_size=200):
+    """
+    Returns ``{payload: {...}}`` with the best encode time of DRF's stdlib renderer, ``FastJSONRenderer`` and
+    chunked streaming in milliseconds, and the body size in bytes as sent plain, gzipped and, when the
+    ``brotli`` package is installed, brotli-compressed, each with its compression time.
+    """
+    stdlib_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+    results = {}
+    for name, data in encoding_payloads(page_size).items():
+        stdlib_time, content = _best_time(lambda: stdlib_renderer.render(data), repeat)
+        fast_time, fast_content = _best_time(lambda: fast_renderer.render(data), repeat)
+        stream_time, chunks = _best_time(lambda: list(iter_json(data)), repeat)
+        gzip_time, gzipped = _best_time(lambda: gzip.compress(content, compresslevel=6), repeat)
+        result = {
+            'stdlib_ms': round(stdlib_time * 1000, 3),
+            'fast_ms': round(fast_time * 1000, 3),
+            'stream_ms': round(stream_time * 1000, 3),
+            'identical': fast_content == content == b''.join(chunks),
+            'bytes': len(content),
+            'gzip_bytes': len(gzipped),
+            'gzip_ms': round(gzip_time * 1000, 3),
+            'br_bytes': None,
+            'br_ms': None,
+        }
+        if brotli is not None:
+            br_time, compressed = _best_time(lambda: brotli.compress(content, quality=5), repeat)
+            result.update(br_bytes=len(compressed), br_ms=round(br_time * 1000, 3))
+        results[name] = result
+    return results
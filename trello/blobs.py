@@ -0,0 +1,130 @@
+"""
+Content-addressed attachment storage.
+
+Every distinct file is stored once under ``blobs/<sha256>`` and shared by reference-counted
+``AttachmentBlob`` rows; the file is removed when the last attachment using it goes away.
+"""
+import hashlib
+import os
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import AttachmentBlob, CardAttachment
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalFile(File):
+    # Lets FileSystemStorage move the file into place instead of copying it.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def blob_name(digest):
+    return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def file_digest(chunks):
+    digest, size = hashlib.sha256(), 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+@transaction.atomic
+def store_blob(content, digest, size):
+    """
+    Returns the blob for ``digest`` with one more reference, saving ``content`` if it is not stored yet.
+    """
+    name = blob_name(digest)
+    blob, _ = AttachmentBlob.objects.select_for_update().get_or_create(
+        sha256=digest, defaults={'file': name, 'size': size})
+    if not default_storage.exists(blob.file.name):
+        default_storage.save(blob.file.name, content)
+    AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    return blob
+
+
+def store_uploaded_file(uploaded_file):
+    digest, size = file_digest(uploaded_file.chunks())
+    uploaded_file.seek(0)
+    return store_blob(uploaded_file, digest, size)
+
+
+def store_local_file(path, digest=None):
+    if digest is None:
+        with open(path, 'rb') as source:
+            digest, _ = file_digest(iter(lambda: source.read(READ_CHUNK_SIZE), b''))
+    with open(path, 'rb') as source:
+        blob = store_blob(LocalFile(source, name=os.path.basename(path)), digest, os.path.getsize(path))
+    if os.path.exists(path):
+        os.remove(path)
+    return blob
+
+
+def adopt_legacy_files(attachments):
+    """
+    Moves the files of ``attachments`` stored before blobs existed into blobs, updating every attachment that
+    shares each file, so the files can be shared by reference counting from then on. Each file is adopted in its
+    own transaction. Returns the number of files adopted.
+    """
+    names = list(attachments.filter(blob__isnull=True).exclude(file='').order_by()
+                 .values_list('file', flat=True).distinct())
+    adopted = 0
+    for name in names:
+        if not default_storage.exists(name):
+            continue
+        with transaction.atomic():
+            with default_storage.open(name) as source:
+                blob = store_uploaded_file(source)
+            updated = CardAttachment.objects.filter(blob__isnull=True, file=name) \
+                .update(blob=blob, file=blob.file.name)
+            # store_blob counted one reference already.
+            if updated > 1:
+                retain_blobs([blob.pk] * (updated - 1))
+            elif not updated:
+                release_blobs([blob.pk])
+            transaction.on_commit(lambda name=name: delete_files([name]))
+        adopted += 1
+    return adopted
+
+
+def _group_by_count(blob_ids):
+    groups = {}
+    for blob_id, count in Counter(blob_id for blob_id in blob_ids if blob_id is not None).items():
+        groups.setdefault(count, []).append(blob_id)
+    return groups
+
+
+def retain_blobs(blob_ids):
+    for count, ids in _group_by_count(blob_ids).items():
+        AttachmentBlob.objects.filter(pk__in=ids).update(ref_count=F('ref_count') + count)
+
+
+def release_blobs(blob_ids):
+    """
+    Drops one reference per occurrence in ``blob_ids`` and deletes blobs, and their files once the
+    transaction commits, when nothing references them any more.
+    """
+    groups = _group_by_count(blob_ids)
+    if not groups:
+        return
+    with transaction.atomic():
+        for count, ids in groups.items():
+            AttachmentBlob.objects.filter(pk__in=ids).update(ref_count=F('ref_count') - count)
+        released = [blob_id for ids in groups.values() for blob_id in ids]
+        unused = list(AttachmentBlob.objects.select_for_update().filter(pk__in=released, ref_count__lte=0)
+                      .values_list('pk', 'file'))
+        if unused:
+            AttachmentBlob.objects.filter(pk__in=[pk for pk, _ in unused]).delete()
+            transaction.on_commit(lambda: delete_files([name for _, name in unused]))
+
+
+def delete_files(names):
+    for name in names:
+        default_storage.delete(name)
@@ -0,0 +1,149 @@
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .membership import get_memberships
+from .models import BoardChange
+from .purge import raw_delete
+from .signals import notify_changes
+
+BULK_MAX_ITEMS = getattr(settings, 'TRELLO_BULK_MAX_ITEMS', 500)
+
+
+def new_slug():
+    return str(uuid.uuid4())
+
+
+class BulkModelMixin:
+    """
+    Adds ``POST``/``PATCH``/``DELETE`` ``.../bulk/`` actions taking a list payload.
+
+    Parents and permissions are resolved once per distinct parent and board, rows are written with
+    ``bulk_create``/``bulk_update`` in one transaction, and nothing is written unless every item is valid.
+    Errors are reported as a list aligned with the payload.
+    """
+    bulk_parent_field = None
+    bulk_parent_model = None
+    bulk_parent_related = ()
+    bulk_admin_only = False
+    bulk_delete_cascade = ()
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a list of items.'})
+        if len(items) > BULK_MAX_ITEMS:
+            raise ValidationError({'detail': f'At most {BULK_MAX_ITEMS} items can be sent at once.'})
+        handlers = {'POST': self.perform_bulk_create, 'PATCH': self.perform_bulk_update,
+                    'DELETE': self.perform_bulk_destroy}
+        return handlers[request.method](items)
+
+    def has_bulk_permission(self, board_id):
+        memberships = get_memberships(self.request.user)
+        return memberships.get(board_id, False) if self.bulk_admin_only else board_id in memberships
+
+    def bulk_error_response(self, errors):
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build_bulk_instances(self, rows):
+        """
+        Returns unsaved instances for ``(validated_data, parent)`` rows.
+        """
+        model = self.get_queryset().model
+        return [model(**data, **{self.bulk_parent_field: parent}, board_id=parent.board_id, slug=new_slug())
+                for data, parent in rows]
+
+    def after_bulk_create(self, instances):
+        pass
+
+    def perform_bulk_create(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        valid = serializer.is_valid()
+        errors = [dict(error) for error in serializer.errors] if not valid else [{} for _ in items]
+        slugs = {item.get(self.bulk_parent_field) for item in items if isinstance(item, dict)}
+        parents = self.bulk_parent_model.objects.filter(slug__in=slugs).select_related(*self.bulk_parent_related)
+        parents = {parent.slug: parent for parent in parents}
+        for index, item in enumerate(items):
+            parent = parents.get(item.get(self.bulk_parent_field)) if isinstance(item, dict) else None
+            if parent is None:
+                errors[index][self.bulk_parent_field] = ['Not found.']
+            elif not self.has_bulk_permission(parent.board_id):
+                errors[index][self.bulk_parent_field] = ['You do not have permission to add items here.']
+        if any(errors):
+            return self.bulk_error_response(errors)
+
+        rows = [(data, parents[item[self.bulk_parent_field]])
+                for data, item in zip(serializer.validated_data, items)]
+        with transaction.atomic():
+            instances = self.get_queryset().model.objects.bulk_create(self.build_bulk_instances(rows))
+            self.after_bulk_create(instances)
+            notify_changes(instances, BoardChange.CREATED)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    def get_bulk_instances(self, slugs):
+        return {instance.slug: instance for instance in self.get_queryset().filter(slug__in=slugs)}
+
+    def check_bulk_instance(self, instance):
+        if instance is None:
+            return {'slug': ['Not found.']}
+        if not self.has_bulk_permission(instance.board_id):
+            return {'slug': ['You do not have permission to change this item.']}
+        return {}
+
+    def perform_bulk_update(self, items):
+        slugs = [item.get('slug') if isinstance(item, dict) else None for item in items]
+        instances = self.get_bulk_instances(slugs)
+        errors, updates, fields = [], [], set()
+        for item, slug in zip(items, slugs):
+            instance = instances.get(slug)
+            error = self.check_bulk_instance(instance)
+            if not error:
+                serializer = self.get_serializer(instance, data=item, partial=True)
+                if serializer.is_valid():
+                    updates.append((instance, serializer.validated_data))
+                else:
+                    error = dict(serializer.errors)
+            errors.append(error)
+        if any(errors):
+            return self.bulk_error_response(errors)
+
+        now = timezone.now()
+        for instance, data in updates:
+            for field, value in data.items():
+                setattr(instance, field, value)
+            fields.update(data)
+            if hasattr(instance, 'updated_at'):
+                instance.updated_at = now
+                fields.add('updated_at')
+        changed = list({instance.pk: instance for instance, _ in updates}.values())
+        with transaction.atomic():
+            if fields:
+                self.get_queryset().model.objects.bulk_update(changed, fields)
+            notify_changes(changed, BoardChange.UPDATED)
+        return Response(self.get_serializer(changed, many=True).data)
+
+    def perform_bulk_destroy(self, items):
+        slugs = [item.get('slug') if isinstance(item, dict) else item for item in items]
+        instances = self.get_bulk_instances([slug for slug in slugs if isinstance(slug, str)])
+        errors = [self.check_bulk_instance(instances.get(slug) if isinstance(slug, str) else None)
+                  for slug in slugs]
+        if any(errors):
+            return self.bulk_error_response(errors)
+
+        model = self.get_queryset().model
+        deleted = list(instances.values())
+        ids = [instance.pk for instance in deleted]
+        with transaction.atomic():
+            # Set-based deletes; the tombstones below stand in for the per-row delete signals.
+            for related_model, field in self.bulk_delete_cascade:
+                raw_delete(related_model.objects.filter(**{f'{field}__in': ids}))
+            raw_delete(model.objects.filter(pk__in=ids))
+            notify_changes(deleted, BoardChange.DELETED)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,109 @@
+import json
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import BoardChange, BoardMember, List, Card, CardAttachment, CardComment, CardTag
+from .optimizers import optimize_queryset
+from .serializers import ListSerializer, CardSerializer, CardAttachmentSerializer, CardCommentSerializer, \
+    CardTagSerializer
+
+CHANGES_BATCH_SIZE = getattr(settings, 'TRELLO_CHANGES_BATCH_SIZE', 500)
+# Seconds a change may take to commit after it was logged. Ids are handed out before commit, so the returned
+# cursor stays behind changes younger than this.
+CHANGES_CURSOR_MARGIN = getattr(settings, 'TRELLO_CHANGES_CURSOR_MARGIN', 60)
+
+CHANGE_MODELS = {
+    List: ('list', ListSerializer),
+    Card: ('card', CardSerializer),
+    CardAttachment: ('attachment', CardAttachmentSerializer),
+    CardComment: ('comment', CardCommentSerializer),
+    CardTag: ('tag', CardTagSerializer),
+    BoardMember: ('member', None),
+}
+MODELS_BY_NAME = {name: (model, serializer_class) for model, (name, serializer_class) in CHANGE_MODELS.items()}
+
+
+def record_changes(instances, action):
+    BoardChange.objects.bulk_create([BoardChange(
+        board_id=instance.board_id,
+        model=CHANGE_MODELS[type(instance)][0],
+        object_id=instance.pk,
+        slug=instance.user.slug if isinstance(instance, BoardMember) else instance.slug,
+        action=action,
+    ) for instance in instances])
+
+
+def _serialize_members(members):
+    return {member.pk: {
+        'user': member.user.slug,
+        'user_name': member.user.full_name,
+        'is_admin': member.is_admin,
+        'is_active': member.is_active,
+    } for member in members}
+
+
+def _current_rows(name, object_ids, request):
+    model, serializer_class = MODELS_BY_NAME[name]
+    if serializer_class is None:
+        return _serialize_members(BoardMember.objects.filter(id__in=object_ids).select_related('user'))
+    queryset = optimize_queryset(model.objects.filter(id__in=object_ids), serializer_class)
+    return {instance.pk: serializer_class(instance, context={'request': request}).data for instance in queryset}
+
+
+def _changes(board, since, until, request):
+    # Pages through the log by id. Each window keeps the last change per object unless the object changes
+    # again later in the log, so every page costs the same however long the catch-up is.
+    changes = BoardChange.objects.filter(board=board, id__lte=until)
+    cursor = since
+    while True:
+        window = list(changes.filter(id__gt=cursor).order_by('id')[:CHANGES_BATCH_SIZE])
+        if not window:
+            return
+        cursor = window[-1].pk
+        latest = {(change.model, change.object_id): change for change in window}
+        superseded = set(changes.filter(id__gt=cursor, object_id__in={object_id for _, object_id in latest})
+                         .values_list('model', 'object_id'))
+        batch = sorted((change for key, change in latest.items() if key not in superseded), key=lambda c: c.pk)
+        object_ids = {}
+        for change in batch:
+            if change.action != BoardChange.DELETED:
+                object_ids.setdefault(change.model, []).append(change.object_id)
+        rows = {name: _current_rows(name, ids, request) for name, ids in object_ids.items()}
+        for change in batch:
+            data = rows.get(change.model, {}).get(change.object_id)
+            # Rows removed by a cascade are only logged through their parent; report them as deleted too.
+            action = BoardChange.DELETED if data is None else change.action
+            entry = {'cursor': change.pk, 'type': change.model, 'action': action, 'slug': change.slug}
+            if data is not None:
+                entry['data'] = data
+            yield entry
+
+
+def safe_cursor(board, since):
+    """
+    Returns the newest change id that every later commit is expected to follow. Changes logged within
+    ``CHANGES_CURSOR_MARGIN`` seconds are still sent, and sent again from this cursor.
+    """
+    cutoff = timezone.now() - timedelta(seconds=CHANGES_CURSOR_MARGIN)
+    settled = BoardChange.objects.filter(board=board, id__gt=since, changed_at__lt=cutoff).aggregate(last=Max('id'))
+    return max(settled['last'] or since, since)
+
+
+def stream_changes(board, since, request):
+    """
+    Yields a JSON document with the latest change of every object touched after ``since``, in bounded
+    batches, and the cursor to resume from.
+
+    Deleting a list or card logs a tombstone for that row only; clients drop its children with it.
+    """
+    cursor = safe_cursor(board, since)
+    until = BoardChange.objects.filter(board=board).aggregate(last=Max('id'))['last'] or since
+    yield '{"changes":['
+    for index, entry in enumerate(_changes(board, since, until, request)):
+        yield (',' if index else '') + json.dumps(entry, cls=JSONEncoder)
+    yield '],"cursor":%d}' % cursor
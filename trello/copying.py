@@ -0,0 +1,58 @@
+import uuid
+
+from django.db import transaction
+
+from .blobs import retain_blobs
+from .models import Board, BoardMember, List, ListMember, Card, CardMember, CardComment, CardTag, CardAttachment
+
+
+def _slug():
+    return str(uuid.uuid4())
+
+
+@transaction.atomic
+def copy_board(board, user, name=None, include_comments=False, include_attachments=False):
+    """
+    Duplicates a board's lists, cards and tags (optionally comments, and attachments by blob reference) for
+    ``user`` with one ``bulk_create`` per model, whatever the size of the board. The source board is only read.
+    Attachments stored before blobs existed are left out until ``adopt_legacy_attachments`` has moved them
+    into blobs.
+    """
+    board_copy = Board.objects.create(name=name or board.name, description=board.description, created_by=user)
+    BoardMember.objects.create(board=board_copy, user=user, is_active=True, is_admin=True)
+
+    source_lists = list(List.objects.filter(board=board).order_by('id'))
+    lists = List.objects.bulk_create([List(
+        board=board_copy, slug=_slug(), name=source.name, description=source.description, position=source.position,
+        is_active=source.is_active, created_by=user,
+    ) for source in source_lists])
+    list_ids = {source.pk: board_list.pk for source, board_list in zip(source_lists, lists)}
+    ListMember.objects.bulk_create([ListMember(list=board_list, user=user, is_active=True) for board_list in lists])
+
+    source_cards = list(Card.objects.filter(board=board).order_by('id'))
+    cards = Card.objects.bulk_create([Card(
+        list_id=list_ids[source.list_id], board=board_copy, slug=_slug(), name=source.name,
+        description=source.description, position=source.position, is_active=source.is_active, created_by=user,
+    ) for source in source_cards])
+    card_ids = {source.pk: card.pk for source, card in zip(source_cards, cards)}
+    CardMember.objects.bulk_create([CardMember(card=card, user=user, is_active=True) for card in cards])
+
+    CardTag.objects.bulk_create([CardTag(
+        card_id=card_ids[card_id], board=board_copy, slug=_slug(), tag=tag, is_active=is_active,
+    ) for card_id, tag, is_active in CardTag.objects.filter(board=board).values_list('card_id', 'tag', 'is_active')])
+    if include_comments:
+        comments = CardComment.objects.filter(board=board).values_list('card_id', 'user_id', 'comment', 'is_active')
+        CardComment.objects.bulk_create([CardComment(
+            card_id=card_ids[card_id], board=board_copy, slug=_slug(), user_id=user_id, comment=comment,
+            is_active=is_active,
+        ) for card_id, user_id, comment, is_active in comments])
+    if include_attachments:
+        # Copies share blobs by reference count; a legacy file has no count to share.
+        attachments = CardAttachment.objects.filter(board=board, blob__isnull=False).values_list(
+            'card_id', 'file', 'name', 'blob_id', 'is_active')
+        attachments = CardAttachment.objects.bulk_create([CardAttachment(
+            card_id=card_ids[card_id], board=board_copy, slug=_slug(), file=file, name=name, blob_id=blob_id,
+            is_active=is_active,
+        ) for card_id, file, name, blob_id, is_active in attachments])
+        retain_blobs([attachment.blob_id for attachment in attachments])
+    return board_copy
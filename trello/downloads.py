@@ -0,0 +1,124 @@
+"""
+Attachment downloads.
+
+Permission checks happen in Django; the transfer itself is handed to the front proxy with ``X-Accel-Redirect``
+(nginx) or ``X-Sendfile`` (Apache, lighttpd) when ``TRELLO_DOWNLOAD_OFFLOAD`` is set. Otherwise the file is served
+with ``FileResponse``, which uses the server's ``wsgi.file_wrapper`` for whole files, streams single byte ranges in
+bounded chunks, and answers conditional requests without opening the file.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+DOWNLOAD_OFFLOAD = getattr(settings, 'TRELLO_DOWNLOAD_OFFLOAD', None)
+DOWNLOAD_ACCEL_PREFIX = getattr(settings, 'TRELLO_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Returns ``(start, end)`` for a single satisfiable byte range, ``None`` when the whole file should be sent, or
+    raises ``ValueError`` when the range cannot be satisfied. Multi-range requests get the whole file.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    return last_modified is not None and parse_http_date_safe(validator) == int(last_modified)
+
+
+def read_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def local_path(name):
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def offload_response(name, path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if DOWNLOAD_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = DOWNLOAD_ACCEL_PREFIX + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve_file(request, name, filename, etag=None, last_modified=None):
+    """
+    Serves the stored file ``name`` as a download named ``filename``. ``etag`` must be a quoted entity tag and
+    ``last_modified`` a timestamp; both drive ``If-None-Match``/``If-Modified-Since`` and ``If-Range``.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    path = local_path(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if response is None and DOWNLOAD_OFFLOAD and path:
+        response = offload_response(name, path, content_type)
+    if response is None:
+        response = file_response(request, name, path, content_type, etag, last_modified)
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    if response.status_code != 304:
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def file_response(request, name, path, content_type, etag, last_modified):
+    if not (os.path.exists(path) if path else default_storage.exists(name)):
+        raise Http404("Attachment file not found.")
+    size = os.path.getsize(path) if path else default_storage.size(name)
+    try:
+        byte_range = parse_range(request.headers.get('Range', ''), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb') if path else default_storage.open(name, 'rb')
+    if byte_range is None or not if_range_matches(request, etag, last_modified):
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(read_range(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
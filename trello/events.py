@@ -0,0 +1,113 @@
+"""
+Board change events and the fan-out layer that delivers them to streaming subscribers.
+
+The layer is pluggable through ``TRELLO_EVENT_LAYER``; :class:`InMemoryEventLayer` serves a single process
+and tests. Every subscriber has a bounded queue and is dropped as soon as it falls behind, so one slow
+client never holds events, or memory, for the others.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DROPPED = object()
+
+
+class Subscription:
+    def __init__(self, layer, board_id, queue_size):
+        self.layer = layer
+        self.board_id = board_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def offer(self, event):
+        # Runs on the subscriber's event loop.
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.drop()
+
+    def drop(self):
+        self.close()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(DROPPED)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.layer.unsubscribe(self)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class BaseEventLayer:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+
+    def subscribe(self, board_id):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, board_id, event):
+        raise NotImplementedError
+
+    def has_subscribers(self, board_id):
+        return True
+
+
+class InMemoryEventLayer(BaseEventLayer):
+    def __init__(self, queue_size=100):
+        super().__init__(queue_size)
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, board_id):
+        subscription = Subscription(self, board_id, self.queue_size)
+        with self._lock:
+            self._subscriptions[board_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.board_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.board_id]
+
+    def publish(self, board_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(board_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's event loop is gone.
+                subscription.close()
+
+    def has_subscribers(self, board_id):
+        return board_id in self._subscriptions
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_event_layer():
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = getattr(settings, 'TRELLO_EVENT_LAYER', {})
+                backend = import_string(config.get('BACKEND', 'trello.events.InMemoryEventLayer'))
+                _layer = backend(**config.get('OPTIONS', {}))
+    return _layer
@@ -0,0 +1,84 @@
+"""
+Per-request cost accounting.
+
+``RequestMetricsMiddleware`` opens a ``RequestMetrics`` for each request in a context variable. A single
+execute wrapper, installed on every database connection as it is created, adds each query's count and time
+to the current metrics, and ``TimedSerializerMixin`` adds the time spent turning instances into primitives.
+Context variables follow requests into ``sync_to_async`` threads, so sync and async views are covered alike.
+Outside a request the wrapper only pays for a context variable lookup.
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+_current = ContextVar('trello_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'serializer_time', 'serializer_depth', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.statements = Counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated_statements(self, limit=3):
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_metrics():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Adds ``to_representation`` time to the current request's metrics. Nested serializers are counted once,
+    as part of the outermost one.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        started = time.perf_counter() if metrics.serializer_depth == 1 else None
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if started is not None:
+                metrics.serializer_time += time.perf_counter() - started
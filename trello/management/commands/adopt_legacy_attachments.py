@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from trello.blobs import adopt_legacy_files
+from trello.models import CardAttachment
+
+
+class Command(BaseCommand):
+    help = 'Moves attachment files stored before blobs existed into shared blobs, so board copies include them.'
+
+    def handle(self, *args, **options):
+        adopted = adopt_legacy_files(CardAttachment.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Adopted {adopted} legacy attachment files.'))
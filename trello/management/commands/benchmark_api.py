@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from trello.benchmarks import ENDPOINTS, compare_to_baseline, generate_scale_data, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks every /api/ and /auth/ endpoint, reporting p50/p95/p99 latency, query counts and peak '
+            'memory. Runs in a throwaway test database filled with scale data unless --use-existing is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--endpoint', action='append', dest='endpoints', choices=[name for name, *_ in ENDPOINTS])
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Run against the configured database, which must hold scale data.')
+        parser.add_argument('--boards', type=int, default=10)
+        parser.add_argument('--lists', type=int, default=8)
+        parser.add_argument('--cards', type=int, default=25)
+        parser.add_argument('--baseline', help='Fail when results regress against this stored report.')
+        parser.add_argument('--save-baseline', help='Write the results to this file.')
+        parser.add_argument('--time-tolerance', type=float, default=0.5)
+        parser.add_argument('--memory-tolerance', type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        test_database = None
+        if not options['use_existing']:
+            test_database = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                if test_database:
+                    generate_scale_data(boards=options['boards'], lists=options['lists'], cards=options['cards'])
+                results = run_benchmarks(options['iterations'], options['warmup'], options['endpoints'])
+        finally:
+            if test_database:
+                connection.creation.destroy_test_db(test_database, verbosity=0)
+
+        self.stdout.write(f"{'endpoint':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KB':>10}"
+                          f"{'status':>8}{'warm ms':>9}")
+        for name, result in results.items():
+            warm = f"{result['warm_p50_ms']:>9.2f}" if 'warm_p50_ms' in result else f"{'-':>9}"
+            self.stdout.write(f"{name:<22}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                              f"{result['queries']:>9}{result['peak_kb']:>10.1f}{result['status']:>8}{warm}")
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+                baseline_file.write('\n')
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                regressions = compare_to_baseline(results, json.load(baseline_file), options['time_tolerance'],
+                                                  options['memory_tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from trello.benchmarks import benchmark_encoding, generate_scale_data
+from trello.renderers import orjson
+
+
+class Command(BaseCommand):
+    help = ('Compares JSON encode time of the stdlib and fast renderers and the bytes on the wire with and without '
+            'gzip and brotli for board-sized payloads. Runs in a throwaway test database filled with scale data '
+            'unless --use-existing is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=200)
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Run against the configured database, which must hold scale data.')
+
+    def handle(self, *args, **options):
+        test_database = None
+        if not options['use_existing']:
+            test_database = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if test_database:
+                generate_scale_data(boards=2, lists=8, cards=25, comments=2)
+            results = benchmark_encoding(options['repeat'], options['page_size'])
+        finally:
+            if test_database:
+                connection.creation.destroy_test_db(test_database, verbosity=0)
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, the fast renderer falls back to json.'))
+        self.stdout.write(f"{'payload':<15}{'stdlib ms':>10}{'fast ms':>9}{'stream ms':>10}{'bytes':>9}"
+                          f"{'gzip':>8}{'gzip ms':>9}{'br':>8}{'br ms':>8}")
+        for name, result in results.items():
+            br_bytes = '-' if result['br_bytes'] is None else result['br_bytes']
+            br_ms = '-' if result['br_ms'] is None else f"{result['br_ms']:.2f}"
+            self.stdout.write(f"{name:<15}{result['stdlib_ms']:>10.2f}{result['fast_ms']:>9.2f}"
+                              f"{result['stream_ms']:>10.2f}{result['bytes']:>9}{result['gzip_bytes']:>8}"
+                              f"{result['gzip_ms']:>9.2f}{br_bytes:>8}{br_ms:>8}")
+        different = [name for name, result in results.items() if not result['identical']]
+        if different:
+            raise CommandError('Fast renderer output differs from the stdlib renderer for: ' + ', '.join(different))
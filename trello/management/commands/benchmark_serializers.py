@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from trello.benchmarks import SERIALIZER_PAIRS, benchmark_serializers, generate_scale_data
+
+
+class Command(BaseCommand):
+    help = ('Compares per-row CPU time of the model serializers and the values() row serializers behind list '
+            'endpoints, and checks that both render identical JSON. Runs in a throwaway test database filled '
+            'with scale data unless --use-existing is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows fetched and serialized per run.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--serializer', action='append', dest='names',
+                            choices=[name for name, *_ in SERIALIZER_PAIRS])
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Run against the configured database, which must hold scale data.')
+
+    def handle(self, *args, **options):
+        test_database = None
+        if not options['use_existing']:
+            test_database = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if test_database:
+                generate_scale_data(boards=5, lists=8, cards=25, comments=1)
+            results = benchmark_serializers(options['rows'], options['repeat'], options['names'])
+        finally:
+            if test_database:
+                connection.creation.destroy_test_db(test_database, verbosity=0)
+
+        self.stdout.write(f"{'serializer':<12}{'rows':>7}{'model us/row':>14}{'row us/row':>12}{'speedup':>9}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<12}{result['rows']:>7}{result['model_us']:>14.2f}{result['row_us']:>12.2f}"
+                              f"{result['speedup']:>8.2f}x")
+        different = [name for name, result in results.items() if not result['identical']]
+        if different:
+            raise CommandError('Row serializers rendered different JSON for: ' + ', '.join(different))
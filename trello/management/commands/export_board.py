@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trello.models import Board
+from trello.portability import EXPORT_CHUNK_SIZE, export_board
+
+
+class Command(BaseCommand):
+    help = 'Writes a board and everything on it as NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug')
+        parser.add_argument('--output', '-o', help='Output file; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            board = Board.objects.select_related('created_by').get(slug=options['slug'])
+        except Board.DoesNotExist:
+            raise CommandError('Board not found.')
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            output.writelines(export_board(board, chunk_size=options['chunk_size']))
+        finally:
+            if output is not sys.stdout:
+                output.close()
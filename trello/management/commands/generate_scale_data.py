@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from trello.benchmarks import SCALE_PASSWORD, generate_scale_data
+
+
+class Command(BaseCommand):
+    help = 'Generates users, boards, lists, cards, members, comments and tags for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--boards', type=int, default=10)
+        parser.add_argument('--lists', type=int, default=8, help='Lists per board.')
+        parser.add_argument('--cards', type=int, default=25, help='Cards per list.')
+        parser.add_argument('--members', type=int, default=5, help='Members per board, owner included.')
+        parser.add_argument('--comments', type=int, default=2, help='Comments per card.')
+        parser.add_argument('--tags', type=int, default=1, help='Tags per card.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = generate_scale_data(
+            users=options['users'], boards=options['boards'], lists=options['lists'], cards=options['cards'],
+            members=options['members'], comments=options['comments'], tags=options['tags'], seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(', '.join(f'{count} {label}' for label, count in created.items()))
+        self.stdout.write(self.style.SUCCESS(f'Scale users sign in with the password "{SCALE_PASSWORD}".'))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from trello.portability import IMPORT_BATCH_SIZE, BoardImporter
+
+
+class Command(BaseCommand):
+    help = 'Creates a new board from an NDJSON board export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Email of the user who owns the imported board.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User not found.')
+        importer = BoardImporter(user, batch_size=options['batch_size'])
+        with open(options['path'], encoding='utf-8') as lines:
+            try:
+                board = importer.run(lines)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        for attachment in importer.skipped_attachments:
+            self.stdout.write(self.style.WARNING(f"Skipped attachment {attachment['name'] or attachment['slug']}: "
+                                                 'its content is not stored here.'))
+        self.stdout.write(self.style.SUCCESS(f'Imported board {board.slug}.'))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trello.purge import PURGE_BATCH_SIZE, purge_changes
+
+
+class Command(BaseCommand):
+    help = 'Deletes board change log entries older than the retention period, in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'TRELLO_CHANGES_RETENTION_DAYS', 30))
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted = purge_changes(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} board changes.'))
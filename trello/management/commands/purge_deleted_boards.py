@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from trello.models import Board
+from trello.purge import PURGE_BATCH_SIZE, purge_board
+
+
+class Command(BaseCommand):
+    help = 'Purges boards marked as deleted, and everything on them, in bounded set-based batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        board_ids = list(Board.objects.filter(deleted_at__isnull=False).values_list('pk', flat=True))
+        for board_id in board_ids:
+            deleted = purge_board(board_id, batch_size=options['batch_size'])
+            self.stdout.write(f'Board {board_id}: ' + ', '.join(f'{count} {label}' for label, count in deleted.items()))
+        self.stdout.write(self.style.SUCCESS(f'Purged {len(board_ids)} boards.'))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trello.models import AttachmentUpload
+from trello.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = 'Discards resumable attachment uploads that have not received data for a while.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        uploads = list(AttachmentUpload.objects.filter(updated_at__lt=cutoff))
+        for upload in uploads:
+            discard_upload(upload)
+        self.stdout.write(self.style.SUCCESS(f'Discarded {len(uploads)} stale uploads.'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Length
+
+from trello.models import Board, List, Card
+from trello.ranking import REBALANCE_LENGTH, rebalance
+
+
+class Command(BaseCommand):
+    help = 'Rewrites list and card positions whose keys grew longer than TRELLO_POSITION_REBALANCE_LENGTH.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--length', type=int, default=REBALANCE_LENGTH)
+
+    def handle(self, *args, **options):
+        long_keys = {'key_length__gt': options['length']}
+        board_ids = List.objects.annotate(key_length=Length('position')).filter(**long_keys) \
+            .values_list('board_id', flat=True).distinct()
+        list_ids = Card.objects.annotate(key_length=Length('position')).filter(**long_keys) \
+            .values_list('list_id', flat=True).distinct()
+        for board_id in board_ids:
+            with transaction.atomic():
+                rebalance(List.objects.filter(board_id=board_id))
+                Board.bump_version(board_id)
+        for list_id, board_id in List.objects.filter(id__in=list_ids).values_list('id', 'board_id'):
+            with transaction.atomic():
+                rebalance(Card.objects.filter(list_id=list_id))
+                Board.bump_version(board_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebalanced {len(board_ids)} boards and {len(list_ids)} lists.'))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import cache
+
+MEMBERSHIP_CACHE_TIMEOUT = getattr(settings, 'TRELLO_MEMBERSHIP_CACHE_TIMEOUT', 300)
+
+
+def _cache_key(user_id):
+    return f'trello:memberships:{user_id}'
+
+
+def get_memberships(user):
+    """
+    Returns a ``{board_id: is_admin}`` mapping of the user's active board memberships.
+
+    The mapping is loaded once per request (it is kept on the user instance) and shared
+    between processes through the cache backend until a ``BoardMember`` write invalidates it.
+    """
+    if user is None or not user.is_authenticated:
+        return {}
+    memberships = getattr(user, '_board_memberships', None)
+    if memberships is None:
+        key = _cache_key(user.pk)
+        memberships = cache.get(key)
+        if memberships is None:
+            from .models import BoardMember
+            memberships = dict(
+                BoardMember.objects.filter(user_id=user.pk, is_active=True, board__deleted_at__isnull=True)
+                .values_list('board_id', 'is_admin')
+            )
+            cache.set(key, memberships, MEMBERSHIP_CACHE_TIMEOUT)
+        user._board_memberships = memberships
+    return memberships
+
+
+def member_board_ids(user):
+    from .models import BoardMember
+    return BoardMember.objects.filter(user=user, is_active=True, board__deleted_at__isnull=True).values('board_id')
+
+
+def invalidate_memberships(user_id, user=None):
+    cache.delete(_cache_key(user_id))
+    if user is not None:
+        user.__dict__.pop('_board_memberships', None)
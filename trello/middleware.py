@@ -0,0 +1,228 @@
+import cProfile
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .instrumentation import finish_request, start_request
+from .profiling import is_sampled, profile_store, profiled_endpoint
+
+logger = logging.getLogger('trello.requests')
+
+SLOW_REQUEST_MS = getattr(settings, 'TRELLO_SLOW_REQUEST_MS', 500)
+SLOW_REQUEST_QUERIES = getattr(settings, 'TRELLO_SLOW_REQUEST_QUERIES', 50)
+SLOW_REQUEST_SQL_LENGTH = 300
+
+COMPRESSION_MIN_SIZE = getattr(settings, 'TRELLO_COMPRESSION_MIN_SIZE', 1024)
+# HTML pages (the browsable API) carry CSRF tokens next to reflected input, so they are left uncompressed.
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/plain')
+# Brotli has no BREACH padding, so it is only negotiated for API data.
+BROTLI_TYPES = ('application/json', 'application/x-ndjson')
+BROTLI_QUALITY = 5
+# Matches GZipMiddleware, which pads gzip output with random bytes to mitigate BREACH.
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+class RequestMetricsMiddleware:
+    """
+    Reports each request's query count, database time and serializer time in a ``Server-Timing`` header, and
+    logs requests that are slow or run many queries together with their most repeated SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, metrics)
+
+    def report(self, request, response, metrics):
+        total_ms, db_ms, serializer_ms = metrics.elapsed * 1000, metrics.db_time * 1000, metrics.serializer_time * 1000
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{metrics.queries} queries"',
+            f'serializer;dur={serializer_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        if total_ms >= SLOW_REQUEST_MS or metrics.queries >= SLOW_REQUEST_QUERIES:
+            match = request.resolver_match
+            repeated = [{'sql': sql[:SLOW_REQUEST_SQL_LENGTH], 'count': count}
+                        for sql, count in metrics.repeated_statements()]
+            logger.warning(
+                'Slow request %s %s status=%s total_ms=%.1f db_ms=%.1f queries=%d serializer_ms=%.1f',
+                request.method, request.path, response.status_code, total_ms, db_ms, metrics.queries, serializer_ms,
+                extra={'route': match.view_name if match else None, 'method': request.method, 'path': request.path,
+                       'status': response.status_code, 'total_ms': round(total_ms, 1), 'db_ms': round(db_ms, 1),
+                       'queries': metrics.queries, 'serializer_ms': round(serializer_ms, 1),
+                       'repeated_sql': repeated},
+            )
+        return response
+
+
+def _start_profiler(profiler):
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread.
+        return False
+    return True
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sample of requests around the rest of the middleware chain, view and rendering included, and
+    files the results per endpoint in ``profile_store``. Under ASGI the profiler runs on the thread Django runs
+    the request's sync code on, which stays the same for the whole request; work done in async views is not
+    seen. Requests whose route is not profiled are dropped once they are resolved.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_sampled():
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        if not _start_profiler(profiler):
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        self.file(request, profiler)
+        return response
+
+    async def __acall__(self, request):
+        if not is_sampled():
+            return await self.get_response(request)
+        profiler = cProfile.Profile()
+        if not await sync_to_async(_start_profiler, thread_sensitive=True)(profiler):
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(profiler.disable, thread_sensitive=True)()
+        self.file(request, profiler)
+        return response
+
+    def file(self, request, profiler):
+        endpoint = profiled_endpoint(request)
+        if endpoint is not None:
+            profile_store.add(endpoint, profiler)
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        quality = params.strip()
+        try:
+            accepted = not quality.startswith('q=') or float(quality[2:]) > 0
+        except ValueError:
+            accepted = False
+        if accepted:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses JSON and NDJSON responses with brotli when the client accepts it and the ``brotli`` package is
+    installed, and those and plain text responses with padded gzip otherwise. Bodies under
+    ``TRELLO_COMPRESSION_MIN_SIZE`` bytes are sent as they are; streamed bodies are compressed chunk by chunk.
+    HTML, event streams and byte-range responses are never compressed.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').partition(';')[0].strip()
+        if response.status_code != 200 or content_type not in COMPRESSIBLE_TYPES \
+                or response.has_header('Content-Encoding') or response.has_header('Accept-Ranges'):
+            return response
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings and content_type in BROTLI_TYPES:
+            encoding = 'br'
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(response.streaming_content, encoding)
+            elif encoding == 'br':
+                response.streaming_content = brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content,
+                                                               max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                content = compress_string(response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # The compressed body is a different representation, so a strong ETag becomes weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    async def compress_async(self, iterator, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            async for chunk in iterator:
+                data = compressor.process(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        else:
+            async for chunk in iterator:
+                yield compress_string(chunk, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
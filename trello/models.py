@@ -1,18 +1,29 @@
 import uuid
 
 from django.db import models
+from django.dispatch import Signal
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .membership import get_memberships
+from .ranking import key_between
+
+# Sent after a card and its comments, tags and attachments moved to another board, with ``previous_board_id``.
+card_moved = Signal()
+
 
 class Board(models.Model):
     name = models.CharField(max_length=50, verbose_name=_('Name'))
     slug = models.SlugField(max_length=40, blank=True)
     description = models.TextField(max_length=500, blank=True, verbose_name=_('Description'))
     is_active = models.BooleanField(default=True)
+    version = models.PositiveBigIntegerField(default=1, editable=False)
     created_by = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name="created_boards")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Id of the newest change log entry removed by retention; older cursors can no longer be served.
+    changes_pruned_to = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -27,13 +38,29 @@ class Board(models.Model):
         if not self.slug:
             self.slug = str(uuid.uuid4())
         self.updated_at = timezone.now()
+        bump = not self._state.adding
+        if bump:
+            self.version = models.F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
         super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+
+    @classmethod
+    def bump_version(cls, *board_ids):
+        cls.objects.filter(pk__in=board_ids).update(version=models.F('version') + 1)
+
+    def mark_deleted(self):
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_active', 'deleted_at', 'updated_at'])
 
     def is_member(self, user):
-        return BoardMember.objects.filter(board=self, user=user, is_active=True).exists()
+        return self.pk in get_memberships(user)
 
     def is_admin(self, user):
-        return BoardMember.objects.filter(board=self, user=user, is_active=True, is_admin=True).exists()
+        return get_memberships(user).get(self.pk, False)
 
 
 class List(models.Model):
@@ -41,6 +68,7 @@ class List(models.Model):
     name = models.CharField(max_length=50, verbose_name=_('Name'))
     slug = models.SlugField(max_length=40, blank=True)
     description = models.TextField(max_length=500, blank=True, verbose_name=_('Description'))
+    position = models.CharField(max_length=128, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='created_lists')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -54,22 +82,28 @@ class List(models.Model):
         verbose_name = _('List')
         verbose_name_plural = _("Lists")
         get_latest_by = 'id'
+        indexes = [models.Index(fields=['board', 'position'])]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = str(uuid.uuid4())
+        if not self.position:
+            last = List.objects.filter(board_id=self.board_id).aggregate(last=models.Max('position'))['last']
+            self.position = key_between(last or None, None)
         self.updated_at = timezone.now()
         super().save(*args, **kwargs)
 
     def is_admin(self, user):
-        return BoardMember.objects.filter(board=self.board, user=user, is_active=True, is_admin=True).exists()
+        return get_memberships(user).get(self.board_id, False)
 
 
 class Card(models.Model):
     list = models.ForeignKey(List, on_delete=models.CASCADE, related_name='cards')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='cards', editable=False)
     name = models.CharField(max_length=50, verbose_name=_('Name'))
     slug = models.SlugField(max_length=40, blank=True)
     description = models.TextField(max_length=500, blank=True, verbose_name=_('Description'))
+    position = models.CharField(max_length=128, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='created_cards')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -83,15 +117,38 @@ class Card(models.Model):
         verbose_name = _('Card')
         verbose_name_plural = _("Cards")
         get_latest_by = 'id'
+        indexes = [
+            models.Index(fields=['board', '-id']),
+            models.Index(fields=['list', 'position']),
+            models.Index(fields=['board', 'position']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = str(uuid.uuid4())
+        if not self.position:
+            last = Card.objects.filter(list_id=self.list_id).aggregate(last=models.Max('position'))['last']
+            self.position = key_between(last or None, None)
         self.updated_at = timezone.now()
-        super().save(*args, **kwargs)
+        previous_board_id = self.board_id
+        moved = previous_board_id is not None and previous_board_id != self.list.board_id
+        self.board_id = self.list.board_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'list' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'board'}
+        # A move is reported through card_moved instead of the usual post_save change.
+        self._moving = moved
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self._moving = False
+        if moved:
+            for model in (CardAttachment, CardComment, CardTag):
+                model.objects.filter(card=self).update(board_id=self.board_id)
+            card_moved.send(sender=Card, instance=self, previous_board_id=previous_board_id)
 
     def is_admin(self, user):
-        return BoardMember.objects.filter(board=self.list.board, user=user, is_active=True, is_admin=True).exists()
+        return get_memberships(user).get(self.board_id, False)
 
 
 class BoardMember(models.Model):
@@ -146,10 +203,31 @@ class CardMember(models.Model):
         return f"{self.card.name} - {self.user.first_name} {self.user.sur_name}"
 
 
+class AttachmentBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _('Attachment Blob')
+        verbose_name_plural = _("Attachment Blobs")
+        get_latest_by = 'id'
+
+    def __str__(self):
+        return self.sha256
+
+
 class CardAttachment(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='attachments')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='attachments', editable=False)
     slug = models.SlugField(max_length=40, blank=True)
     file = models.FileField(upload_to='attachments/', verbose_name=_('Attachment'))
+    name = models.CharField(max_length=255, blank=True, verbose_name=_('Name'))
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, related_name='attachments', null=True,
+                             blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -158,10 +236,37 @@ class CardAttachment(models.Model):
         verbose_name = _('Card Attachment')
         verbose_name_plural = _("Card Attachments")
         get_latest_by = 'id'
+        indexes = [models.Index(fields=['board', '-id'])]
 
     def __str__(self):
         return f"{self.card.name} - {self.file.name}"
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = str(uuid.uuid4())
+        self.board_id = self.card.board_id
+        super().save(*args, **kwargs)
+
+
+class AttachmentUpload(models.Model):
+    slug = models.SlugField(max_length=40, blank=True)
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='uploads')
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='uploads')
+    name = models.CharField(max_length=255, verbose_name=_('Name'))
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _('Attachment Upload')
+        verbose_name_plural = _("Attachment Uploads")
+        get_latest_by = 'id'
+
+    def __str__(self):
+        return f"{self.name} - {self.received}/{self.size}"
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = str(uuid.uuid4())
@@ -170,6 +275,7 @@ class CardAttachment(models.Model):
 
 class CardComment(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='comments')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='comments', editable=False)
     slug = models.SlugField(max_length=40, blank=True)
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='comments')
     comment = models.TextField(max_length=500, verbose_name=_('Comment'))
@@ -181,6 +287,7 @@ class CardComment(models.Model):
         verbose_name = _('Card Comment')
         verbose_name_plural = _("Card Comments")
         get_latest_by = 'id'
+        indexes = [models.Index(fields=['board', '-id'])]
 
     def __str__(self):
         return f"{self.card.name} - {self.user.first_name} {self.user.sur_name}"
@@ -188,11 +295,13 @@ class CardComment(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = str(uuid.uuid4())
+        self.board_id = self.card.board_id
         super().save(*args, **kwargs)
 
 
 class CardTag(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='tags')
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='tags', editable=False)
     slug = models.SlugField(max_length=40, blank=True)
     tag = models.CharField(max_length=50, verbose_name=_('Tag'))
     is_active = models.BooleanField(default=True)
@@ -202,6 +311,7 @@ class CardTag(models.Model):
         verbose_name = _('Card Tag')
         verbose_name_plural = _("Card Tags")
         get_latest_by = 'id'
+        indexes = [models.Index(fields=['board', '-id'])]
 
     def __str__(self):
         return f"{self.card.name} - {self.tag}"
@@ -209,4 +319,31 @@ class CardTag(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = str(uuid.uuid4())
+        self.board_id = self.card.board_id
         super().save(*args, **kwargs)
+
+
+class BoardChange(models.Model):
+    CREATED, UPDATED, DELETED = 'created', 'updated', 'deleted'
+    ACTION_CHOICES = (
+        (CREATED, _('Created')),
+        (UPDATED, _('Updated')),
+        (DELETED, _('Deleted')),
+    )
+
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='changes')
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=40)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _('Board Change')
+        verbose_name_plural = _("Board Changes")
+        get_latest_by = 'id'
+        indexes = [models.Index(fields=['board', 'id']), models.Index(fields=['board', 'object_id'])]
+
+    def __str__(self):
+        return f"{self.board_id} - {self.model} {self.slug} {self.action}"
@@ -0,0 +1,88 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+_plans = {}
+
+
+def related(*paths):
+    """
+    Declares the relations a ``SerializerMethodField`` getter walks, e.g. ``@related('list__board')``.
+    """
+    def decorator(method):
+        method.related_paths = paths
+        return method
+    return decorator
+
+
+def _walk(model, attrs, prefix, many, select, prefetch, skip_last=False):
+    path = prefix
+    for index, attr in enumerate(attrs):
+        if skip_last and index == len(attrs) - 1:
+            break
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation:
+            break
+        path = f'{path}__{attr}' if path else attr
+        many = many or field.one_to_many or field.many_to_many
+        (prefetch if many else select).add(path)
+        model = field.related_model
+    return model, path, many
+
+
+def _plan_serializer(serializer, model, prefix, many, select, prefetch):
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, field.method_name, None)
+            for related_path in getattr(method, 'related_paths', ()):
+                _walk(model, related_path.split('__'), prefix, many, select, prefetch)
+            continue
+        if field.source == '*':
+            continue
+        skip_last = isinstance(field, serializers.PrimaryKeyRelatedField)
+        related_model, path, path_many = _walk(model, field.source_attrs, prefix, many, select, prefetch,
+                                             skip_last=skip_last)
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(child, serializers.BaseSerializer) and path != prefix:
+            _plan_serializer(child, related_model, path, path_many, select, prefetch)
+
+
+def get_queryset_plan(serializer_class):
+    """
+    Returns the ``(select_related, prefetch_related)`` paths needed to render ``serializer_class``.
+    """
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        select, prefetch = set(), set()
+        _plan_serializer(serializer_class(), serializer_class.Meta.model, '', False, select, prefetch)
+        prefetch = {path for path in prefetch if not any(path.startswith(f'{other}__') for other in prefetch)}
+        plan = _plans[serializer_class] = (sorted(select), sorted(prefetch))
+    return plan
+
+
+def optimize_queryset(queryset, serializer_class):
+    # Row serializers read plain values() rows with their related columns joined in.
+    lookups = getattr(serializer_class, 'lookups', None)
+    if lookups is not None:
+        return queryset.values('id', *lookups)
+    select, prefetch = get_queryset_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class ValuesListMixin:
+    """
+    Serves ``list`` through ``values_serializer_class``, a row serializer that renders the same JSON as the
+    model serializer from ``values()`` rows, skipping model instantiation and per-field relation lookups.
+    """
+    values_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.values_serializer_class is not None:
+            return self.values_serializer_class
+        return super().get_serializer_class()
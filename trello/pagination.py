@@ -0,0 +1,56 @@
+from django.conf import settings
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the ``-id`` ordering every trello model shares, so deep pages cost the same as
+    the first one.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'TRELLO_MAX_PAGE_SIZE', 200)
+
+
+class RankedPagination(BasePagination):
+    """
+    Page-number pagination for ranked results, which have no stable key to build a cursor from. It fetches
+    one extra row to detect the next page instead of counting matches.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+    max_page_size = IdCursorPagination.max_page_size
+
+    def paginate(self, fetch, request):
+        self.request = request
+        self.page = _positive_int(request.query_params.get(self.page_query_param), 1)
+        self.size = min(_positive_int(request.query_params.get(self.page_size_query_param), self.page_size),
+                        self.max_page_size)
+        rows = fetch((self.page - 1) * self.size, self.size + 1)
+        self.has_next = len(rows) > self.size
+        return rows[:self.size]
+
+    def get_page_link(self, page):
+        url = self.request.build_absolute_uri()
+        if page == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_page_link(self.page + 1) if self.has_next else None,
+            'previous': self.get_page_link(self.page - 1) if self.page > 1 else None,
+            'results': data,
+        })
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
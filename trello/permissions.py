@@ -8,5 +8,4 @@ class IsBoardMember(BasePermission):
 
 class IsBoardAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
-        print(obj.is_admin(request.user))
         return obj.is_admin(request.user)
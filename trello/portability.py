@@ -0,0 +1,237 @@
+"""
+Streaming NDJSON export and batched import of boards.
+
+An export is one JSON object per line, parents before children: the board, its members, lists, cards, card
+members, comments, tags and attachment metadata. Rows are read with server-side cursors, so export memory
+does not grow with the board. Imports create fresh slugs and insert with ``bulk_create`` in batches. Users are
+mapped by email only when they already share a board with the importing user, everyone else becomes the
+importing user, who is the only admin of the new board. Attachments are only imported when their content is
+already stored as a blob; the others are reported back. Creation timestamps are reset on import.
+"""
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .blobs import retain_blobs
+from .membership import invalidate_memberships, member_board_ids
+from .models import Board, BoardMember, List, Card, CardMember, CardComment, CardTag, CardAttachment, AttachmentBlob
+
+FORMAT_VERSION = 1
+EXPORT_CHUNK_SIZE = getattr(settings, 'TRELLO_EXPORT_CHUNK_SIZE', 2000)
+IMPORT_BATCH_SIZE = getattr(settings, 'TRELLO_IMPORT_BATCH_SIZE', 1000)
+
+EXPORT_ROWS = (
+    ('member', BoardMember, {'user': 'user__email', 'is_active': 'is_active', 'is_admin': 'is_admin'}),
+    ('list', List, {'slug': 'slug', 'name': 'name', 'description': 'description', 'position': 'position',
+                    'is_active': 'is_active', 'created_by': 'created_by__email'}),
+    ('card', Card, {'slug': 'slug', 'list': 'list__slug', 'name': 'name', 'description': 'description',
+                    'position': 'position', 'is_active': 'is_active', 'created_by': 'created_by__email'}),
+    ('card_member', CardMember, {'card': 'card__slug', 'user': 'user__email', 'is_active': 'is_active'}),
+    ('comment', CardComment, {'slug': 'slug', 'card': 'card__slug', 'user': 'user__email', 'comment': 'comment',
+                              'is_active': 'is_active', 'commented_at': 'commented_at'}),
+    ('tag', CardTag, {'slug': 'slug', 'card': 'card__slug', 'tag': 'tag', 'is_active': 'is_active'}),
+    ('attachment', CardAttachment, {'slug': 'slug', 'card': 'card__slug', 'file': 'file', 'name': 'name',
+                                    'sha256': 'blob__sha256', 'is_active': 'is_active', 'uploaded_at': 'uploaded_at'}),
+)
+EXPORT_MODELS = {row_type: (model, columns) for row_type, model, columns in EXPORT_ROWS}
+EXPORT_MODELS['board'] = (Board, {'name': 'name', 'description': 'description', 'is_active': 'is_active'})
+BOARD_FILTERS = {'member': 'board', 'list': 'board', 'card': 'board', 'card_member': 'card__board',
+                 'comment': 'board', 'tag': 'board', 'attachment': 'board'}
+IMPORT_REQUIRED = {
+    'board': ('name',),
+    'member': ('user', 'is_active'),
+    'list': ('slug', 'name', 'description', 'position', 'is_active', 'created_by'),
+    'card': ('slug', 'list', 'name', 'description', 'position', 'is_active', 'created_by'),
+    'card_member': ('card', 'user', 'is_active'),
+    'comment': ('card', 'user', 'comment', 'is_active'),
+    'tag': ('card', 'tag', 'is_active'),
+    'attachment': ('card', 'is_active'),
+}
+IMPORT_PARENTS = {'card': 'list', 'card_member': 'card', 'comment': 'card', 'tag': 'card', 'attachment': 'card'}
+
+
+def _line(row):
+    return json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_board(board, chunk_size=EXPORT_CHUNK_SIZE):
+    yield _line({'type': 'board', 'format': FORMAT_VERSION, 'slug': board.slug, 'name': board.name,
+                 'description': board.description, 'is_active': board.is_active,
+                 'created_by': board.created_by.email})
+    for row_type, model, columns in EXPORT_ROWS:
+        rows = model.objects.filter(**{BOARD_FILTERS[row_type]: board}).order_by('id') \
+            .values_list(*columns.values()).iterator(chunk_size=chunk_size)
+        for values in rows:
+            yield _line({'type': row_type, **dict(zip(columns, values))})
+
+
+class BoardImporter:
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.board = None
+        self.users = {}
+        self.slugs = {'list': set(), 'card': set()}
+        self.list_ids = {}
+        self.card_ids = {}
+        self.member_ids = set()
+        self.skipped_attachments = []
+        self.pending_type = None
+        self.pending_lines = None
+        self.pending = []
+
+    def run(self, lines):
+        with transaction.atomic():
+            for number, line in enumerate(lines, start=1):
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8')
+                if not line.strip():
+                    continue
+                try:
+                    row = self.check(json.loads(line))
+                except (ValueError, KeyError, TypeError) as exc:
+                    raise ValueError(f'Line {number}: {exc}') from exc
+                self.add(row, number)
+            self.flush()
+            if self.board is None:
+                raise ValueError('The export does not contain a board.')
+            BoardMember.objects.get_or_create(board=self.board, user=self.user,
+                                              defaults={'is_active': True, 'is_admin': True})
+        for user_id in self.member_ids | {self.user.pk}:
+            invalidate_memberships(user_id)
+        return self.board
+
+    def check(self, row):
+        """
+        Validates ``row`` against the rows read before it, so errors point at the line that caused them.
+        """
+        if not isinstance(row, dict):
+            raise ValueError('Each line must be a JSON object.')
+        row_type = row.get('type')
+        if row_type not in IMPORT_REQUIRED:
+            raise ValueError(f'Unknown row type {row_type!r}.')
+        if row_type == 'board' and self.board is not None:
+            raise ValueError('An export can only contain one board.')
+        if row_type != 'board' and self.board is None:
+            raise ValueError('The board must be the first row.')
+        for key in IMPORT_REQUIRED[row_type]:
+            if row.get(key) is None:
+                raise ValueError(f'{key!r} is required.')
+        model, columns = EXPORT_MODELS[row_type]
+        for key, lookup in columns.items():
+            if '__' in lookup or row.get(key) is None:
+                continue
+            try:
+                row[key] = model._meta.get_field(lookup).to_python(row[key])
+            except ValidationError as exc:
+                raise ValueError(f'{key!r}: {" ".join(exc.messages)}') from exc
+        parent = IMPORT_PARENTS.get(row_type)
+        if parent is not None and row[parent] not in self.slugs[parent]:
+            raise ValueError(f'Unknown {parent} {row[parent]!r}.')
+        if row_type in self.slugs:
+            self.slugs[row_type].add(row['slug'])
+        return row
+
+    def add(self, row, number=None):
+        row_type = row.pop('type')
+        if row_type == 'board':
+            self.board = Board.objects.create(name=row['name'], description=row.get('description', ''),
+                                              is_active=row.get('is_active', True), created_by=self.user)
+            return
+        if row_type != self.pending_type or len(self.pending) >= self.batch_size:
+            self.flush()
+            self.pending_type = row_type
+            self.pending_lines = [number, number]
+        self.pending.append(row)
+        self.pending_lines[1] = number
+
+    def resolve_users(self, rows, *keys):
+        emails = {row.get(key) for row in rows for key in keys} - set(self.users)
+        if emails:
+            # Only people the importer already works with can be named in an import.
+            colleagues = BoardMember.objects.filter(board_id__in=member_board_ids(self.user)).values('user_id')
+            found = get_user_model().objects.filter(email__in=emails, pk__in=colleagues).only('pk', 'email')
+            self.users.update({user.email: user for user in found})
+
+    def user_for(self, email):
+        return self.users.get(email, self.user)
+
+    def flush(self):
+        rows, row_type = self.pending, self.pending_type
+        self.pending = []
+        if not rows:
+            return
+        try:
+            getattr(self, f'create_{row_type}s')(rows)
+        except (ValueError, KeyError, TypeError, ValidationError) as exc:
+            first, last = self.pending_lines
+            raise ValueError(f'Lines {first}-{last}: {exc}') from exc
+
+    def create_members(self, rows):
+        self.resolve_users(rows, 'user')
+        members = {}
+        for row in rows:
+            user = self.user_for(row['user'])
+            is_importer = user.pk == self.user.pk
+            members[user.pk] = BoardMember(board=self.board, user=user, is_active=row['is_active'] or is_importer,
+                                           is_admin=is_importer)
+        BoardMember.objects.bulk_create(members.values(), ignore_conflicts=True)
+        self.member_ids.update(members)
+
+    def create_lists(self, rows):
+        self.resolve_users(rows, 'created_by')
+        lists = List.objects.bulk_create([List(
+            board=self.board, slug=str(uuid.uuid4()), name=row['name'], description=row['description'],
+            position=row['position'], is_active=row['is_active'], created_by=self.user_for(row['created_by']),
+        ) for row in rows])
+        self.list_ids.update({row['slug']: board_list.pk for row, board_list in zip(rows, lists)})
+
+    def create_cards(self, rows):
+        self.resolve_users(rows, 'created_by')
+        cards = Card.objects.bulk_create([Card(
+            list_id=self.list_ids[row['list']], board=self.board, slug=str(uuid.uuid4()), name=row['name'],
+            description=row['description'], position=row['position'], is_active=row['is_active'],
+            created_by=self.user_for(row['created_by']),
+        ) for row in rows])
+        self.card_ids.update({row['slug']: card.pk for row, card in zip(rows, cards)})
+
+    def create_card_members(self, rows):
+        self.resolve_users(rows, 'user')
+        CardMember.objects.bulk_create([CardMember(
+            card_id=self.card_ids[row['card']], user=self.user_for(row['user']), is_active=row['is_active'],
+        ) for row in rows], ignore_conflicts=True)
+
+    def create_comments(self, rows):
+        self.resolve_users(rows, 'user')
+        CardComment.objects.bulk_create([CardComment(
+            card_id=self.card_ids[row['card']], board=self.board, slug=str(uuid.uuid4()),
+            user=self.user_for(row['user']), comment=row['comment'], is_active=row['is_active'],
+        ) for row in rows])
+
+    def create_tags(self, rows):
+        CardTag.objects.bulk_create([CardTag(
+            card_id=self.card_ids[row['card']], board=self.board, slug=str(uuid.uuid4()), tag=row['tag'],
+            is_active=row['is_active'],
+        ) for row in rows])
+
+    def create_attachments(self, rows):
+        # Files are taken from stored blobs, never from the export, which could name any file in storage.
+        blobs = {blob.sha256: blob for blob in AttachmentBlob.objects.filter(
+            sha256__in={row.get('sha256') for row in rows}).only('pk', 'sha256', 'file')}
+        self.skipped_attachments.extend({'slug': row.get('slug'), 'card': row['card'], 'name': row.get('name', '')}
+                                        for row in rows if row.get('sha256') not in blobs)
+        attachments = CardAttachment.objects.bulk_create([CardAttachment(
+            card_id=self.card_ids[row['card']], board=self.board, slug=str(uuid.uuid4()),
+            file=blobs[row['sha256']].file.name, name=row.get('name', ''), blob=blobs[row['sha256']],
+            is_active=row['is_active'],
+        ) for row in rows if row.get('sha256') in blobs])
+        retain_blobs([attachment.blob_id for attachment in attachments])
+
+
+def import_board(lines, user, batch_size=IMPORT_BATCH_SIZE):
+    return BoardImporter(user, batch_size=batch_size).run(lines)
@@ -0,0 +1,72 @@
+"""
+Sampled CPU profiling of API endpoints.
+
+With ``TRELLO_PROFILING['SAMPLE_RATE']`` above zero, ``ProfilingMiddleware`` runs that fraction of requests
+under ``cProfile``, under WSGI and ASGI alike, optionally only for the route names in
+``TRELLO_PROFILING['ROUTES']`` (for example ``card-list``). Profiles are merged per endpoint in process
+memory and can be downloaded by staff from ``/api/profiles/`` as pstats files, which ``snakeviz``,
+``flameprof`` or ``gprof2dot`` read directly. Each worker process keeps its own profiles.
+"""
+import marshal
+import pstats
+import random
+import threading
+
+from django.conf import settings
+
+PROFILING = getattr(settings, 'TRELLO_PROFILING', {})
+PROFILE_SAMPLE_RATE = PROFILING.get('SAMPLE_RATE', 0.0)
+PROFILE_ROUTES = frozenset(PROFILING.get('ROUTES', ()))
+
+
+class ProfileStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = {}
+
+    def add(self, endpoint, profiler):
+        stats = pstats.Stats(profiler)
+        with self.lock:
+            entry = self.profiles.get(endpoint)
+            if entry is None:
+                self.profiles[endpoint] = [stats, 1]
+            else:
+                entry[0].add(stats)
+                entry[1] += 1
+
+    def summary(self):
+        with self.lock:
+            return [{'endpoint': endpoint, 'samples': samples, 'total_time': round(stats.total_tt, 6)}
+                    for endpoint, (stats, samples) in sorted(self.profiles.items())]
+
+    def dump(self, endpoint):
+        """
+        Returns the merged profile of ``endpoint`` in the ``pstats`` file format, or ``None``.
+        """
+        with self.lock:
+            entry = self.profiles.get(endpoint)
+            return marshal.dumps(entry[0].stats) if entry else None
+
+    def reset(self):
+        with self.lock:
+            self.profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+def is_sampled(sample_rate=None):
+    sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+def profiled_endpoint(request, routes=None):
+    """
+    Returns the endpoint name to file a profile of ``request`` under, or ``None`` when its route is not profiled.
+    Reads ``request.resolver_match``, so it is only known once the request has been handled.
+    """
+    routes = PROFILE_ROUTES if routes is None else routes
+    match = request.resolver_match
+    if match is None or (routes and match.view_name not in routes):
+        return None
+    return f'{match.view_name}.{request.method.lower()}'
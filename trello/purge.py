@@ -0,0 +1,95 @@
+"""
+Set-based deletion of boards and lists.
+
+Django's cascade collector loads every descendant into memory and deletes it row by row. These helpers
+delete descendants leaf first in bounded ``DELETE ... WHERE id IN (...)`` batches instead, each batch in its
+own short transaction, and release attachment files batch by batch.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .blobs import delete_files, release_blobs
+from .models import Board, BoardChange, BoardMember, List, ListMember, Card, CardMember, CardAttachment, \
+    CardComment, CardTag, AttachmentUpload
+from .uploads import delete_upload_files
+
+PURGE_BATCH_SIZE = getattr(settings, 'TRELLO_PURGE_BATCH_SIZE', 1000)
+
+
+def raw_delete(queryset):
+    """
+    Deletes ``queryset`` with a single DELETE, bypassing the cascade collector and model signals. Deleted
+    attachments release their blobs; files of attachments stored before blobs existed, and the temporary files
+    of unfinished uploads, are deleted on commit.
+    """
+    if queryset.model is CardAttachment:
+        rows = list(queryset.values_list('blob_id', 'file'))
+        deleted = queryset._raw_delete(queryset.db)
+        release_blobs([blob_id for blob_id, _ in rows])
+        names = [name for blob_id, name in rows if blob_id is None and name]
+        transaction.on_commit(lambda: delete_files(names))
+        return deleted
+    if queryset.model is AttachmentUpload:
+        slugs = list(queryset.values_list('slug', flat=True))
+        deleted = queryset._raw_delete(queryset.db)
+        transaction.on_commit(lambda: delete_upload_files(slugs))
+        return deleted
+    return queryset._raw_delete(queryset.db)
+
+
+def _delete_in_batches(model, filters, batch_size):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(model.objects.filter(**filters).order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += raw_delete(model.objects.filter(pk__in=ids))
+
+
+def _purge(steps, batch_size):
+    return {model._meta.label: _delete_in_batches(model, filters, batch_size) for model, filters in steps}
+
+
+def purge_board(board_id, batch_size=PURGE_BATCH_SIZE):
+    return _purge([
+        (CardAttachment, {'board_id': board_id}),
+        (CardComment, {'board_id': board_id}),
+        (CardTag, {'board_id': board_id}),
+        (CardMember, {'card__board_id': board_id}),
+        (AttachmentUpload, {'card__board_id': board_id}),
+        (Card, {'board_id': board_id}),
+        (ListMember, {'list__board_id': board_id}),
+        (List, {'board_id': board_id}),
+        (BoardMember, {'board_id': board_id}),
+        (BoardChange, {'board_id': board_id}),
+        (Board, {'pk': board_id}),
+    ], batch_size)
+
+
+def purge_list(list_id, batch_size=PURGE_BATCH_SIZE):
+    return _purge([
+        (CardAttachment, {'card__list_id': list_id}),
+        (CardComment, {'card__list_id': list_id}),
+        (CardTag, {'card__list_id': list_id}),
+        (CardMember, {'card__list_id': list_id}),
+        (AttachmentUpload, {'card__list_id': list_id}),
+        (Card, {'list_id': list_id}),
+        (ListMember, {'list_id': list_id}),
+        (List, {'pk': list_id}),
+    ], batch_size)
+
+
+def purge_changes(before, batch_size=PURGE_BATCH_SIZE):
+    """
+    Deletes change log entries logged before ``before``. Each board first records the newest id removed, so
+    clients holding an older cursor are sent back to the snapshot instead of missing changes.
+    """
+    pruned = list(BoardChange.objects.filter(changed_at__lt=before).order_by().values('board_id')
+                  .annotate(last=Max('id')).values_list('board_id', 'last'))
+    with transaction.atomic():
+        for board_id, last in pruned:
+            Board.objects.filter(pk=board_id, changes_pruned_to__lt=last).update(changes_pruned_to=last)
+    last = max((last for _, last in pruned), default=0)
+    return _delete_in_batches(BoardChange, {'changed_at__lt': before, 'id__lte': last}, batch_size)
@@ -0,0 +1,92 @@
+"""
+Fractional position keys.
+
+Keys are base-36 fractions (``'i'`` is 0.5) compared as plain strings, so a row can be placed between any
+two neighbours by writing only its own key. Keys never end with ``'0'``, which keeps string order equal to
+numeric order.
+"""
+from django.conf import settings
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+STEP_LENGTH = 4
+REBALANCE_LENGTH = getattr(settings, 'TRELLO_POSITION_REBALANCE_LENGTH', 32)
+
+
+def _decode(key, length):
+    value = 0
+    for digit in key[:length].ljust(length, '0'):
+        value = value * BASE + DIGITS.index(digit)
+    return value
+
+
+def _encode(value, length):
+    digits = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip('0')
+
+
+def _midpoint(low, high):
+    if high is not None:
+        common = 0
+        while (low[common] if common < len(low) else '0') == high[common]:
+            common += 1
+        if common:
+            return high[:common] + _midpoint(low[common:], high[common:])
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit + 1) // 2]
+    if high is not None and len(high) > 1:
+        return high[:1]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def key_between(before, after):
+    """
+    Returns a key sorting strictly between ``before`` and ``after``; either may be ``None`` for an open end.
+
+    Appending and prepending step by one unit at ``STEP_LENGTH`` digits instead of halving the remaining
+    gap, so keys stay short when rows are always added at one end.
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f'{before!r} must sort before {after!r}.')
+    if before is not None and after is None:
+        value = _decode(before, STEP_LENGTH) + 1
+        if value < BASE ** STEP_LENGTH:
+            return _encode(value, STEP_LENGTH)
+    if before is None and after is not None:
+        value = _decode(after, STEP_LENGTH)
+        if len(after.rstrip('0')) <= STEP_LENGTH:
+            value -= 1
+        if value > 0:
+            return _encode(value, STEP_LENGTH)
+    return _midpoint(before or '', after)
+
+
+def spread_keys(count):
+    """
+    Returns ``count`` short, evenly spaced keys in ascending order.
+    """
+    length = STEP_LENGTH
+    while BASE ** length <= count * 2:
+        length += 1
+    step = BASE ** length // (count + 1)
+    return [_encode(step * (index + 1), length) for index in range(count)]
+
+
+def needs_rebalance(key):
+    return len(key) > REBALANCE_LENGTH
+
+
+def rebalance(queryset):
+    """
+    Rewrites the positions of ``queryset`` (one list's cards or one board's lists) with evenly spaced keys.
+    """
+    rows = list(queryset.order_by('position', 'id').only('pk', 'position'))
+    for row, key in zip(rows, spread_keys(len(rows))):
+        row.position = key
+    queryset.model.objects.bulk_update(rows, ['position'], batch_size=500)
+    return len(rows)
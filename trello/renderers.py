@@ -0,0 +1,155 @@
+"""
+JSON rendering and parsing on orjson, with the stdlib ``json`` module as a fallback when it is not installed.
+
+``FastJSONRenderer`` writes the same compact UTF-8 as DRF's ``JSONRenderer`` and defers to it for indented
+output. Types orjson does not handle natively, and datetimes so they keep DRF's format, go through DRF's
+``JSONEncoder``. ``StreamingJSONMixin`` sends large responses as a stream of chunks encoded on the fly.
+"""
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import parsers, renderers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STREAM_MIN_ITEMS = getattr(settings, 'TRELLO_STREAM_MIN_ITEMS', 200)
+STREAM_CHUNK_SIZE = 64 * 1024
+# While streaming, lists of at least this many items are encoded this many items at a time, and values that
+# contain no such list are encoded in one piece.
+STREAM_BATCH_ITEMS = 10
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    if orjson is not None:
+        content = orjson.dumps(data, default=_encoder.default,
+                               option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    else:
+        content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    # Same as DRF: U+2028 and U+2029 are valid JSON but end lines in JavaScript.
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
+
+
+def count_items(data, limit):
+    """
+    Counts list items in ``data``, nested ones included, stopping once ``limit`` is reached.
+    """
+    count, stack = 0, [data]
+    while stack and count < limit:
+        value = stack.pop()
+        if isinstance(value, dict):
+            value = value.values()
+        else:
+            count += len(value)
+        stack.extend([child for child in value if isinstance(child, (dict, list, tuple))])
+    return count
+
+
+def _is_large(data):
+    if isinstance(data, dict):
+        return any(_is_large(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return len(data) >= STREAM_BATCH_ITEMS or any(_is_large(item) for item in data)
+    return False
+
+
+def _fragments(data):
+    # Only called for large containers. Small values are encoded whole, long lists in batches of items.
+    if isinstance(data, dict):
+        yield b'{'
+        for index, (key, value) in enumerate(data.items()):
+            key = (b',' if index else b'') + dumps(str(key)) + b':'
+            if _is_large(value):
+                yield key
+                yield from _fragments(value)
+            else:
+                yield key + dumps(value)
+        yield b'}'
+        return
+    yield b'['
+    if len(data) < STREAM_BATCH_ITEMS:
+        for index, item in enumerate(data):
+            if index:
+                yield b','
+            if _is_large(item):
+                yield from _fragments(item)
+            else:
+                yield dumps(item)
+    else:
+        for start in range(0, len(data), STREAM_BATCH_ITEMS):
+            yield (b',' if start else b'') + dumps(data[start:start + STREAM_BATCH_ITEMS])[1:-1]
+    yield b']'
+
+
+def iter_json(data, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields ``data`` as JSON in chunks of about ``chunk_size`` bytes. Joined, the chunks equal ``dumps(data)``.
+    """
+    if not _is_large(data):
+        yield dumps(data)
+        return
+    buffer, size = [], 0
+    for fragment in _fragments(data):
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class StreamingJSONMixin:
+    """
+    Streams successful JSON responses holding at least ``STREAM_MIN_ITEMS`` list items, so the first bytes
+    leave before the whole body is encoded and the encoded body is never held in memory at once.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(response, 'accepted_renderer', None)
+        if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK \
+                or not isinstance(renderer, FastJSONRenderer) or response.data is None \
+                or renderer.get_indent(response.accepted_media_type, response.renderer_context) is not None \
+                or count_items(response.data, STREAM_MIN_ITEMS) < STREAM_MIN_ITEMS:
+            return response
+        streaming = StreamingHttpResponse(iter_json(response.data), content_type=response.accepted_media_type)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+        return streaming
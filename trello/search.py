@@ -0,0 +1,131 @@
+"""
+Full-text search over card names/descriptions and comments.
+
+PostgreSQL uses GIN expression indexes over ``to_tsvector`` that the database keeps up to date. SQLite (local
+tests) uses an FTS5 table maintained by triggers and filled from existing rows when it is created. Both
+indexes are created after ``migrate`` by :func:`ensure_search_index`. Other backends fall back to unranked
+substring matching.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+
+from .models import Card, CardComment
+
+SEARCH_CONFIG = getattr(settings, 'TRELLO_SEARCH_CONFIG', 'english')
+
+CARD, COMMENT = 'card', 'comment'
+
+_SQLITE_TRIGGERS = {
+    'trello_card': (0, ('name', 'description')),
+    'trello_cardcomment': (1, ('comment',)),
+}
+
+
+def _sqlite_body(columns, prefix=''):
+    return " || ' ' || ".join(prefix + column for column in columns)
+
+
+def _card_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('name', 'description', config=SEARCH_CONFIG)
+
+
+def _comment_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('comment', config=SEARCH_CONFIG)
+
+
+def _ensure_postgres_index(connection):
+    from django.contrib.postgres.indexes import GinIndex
+    with connection.cursor() as cursor:
+        existing = {
+            model: connection.introspection.get_constraints(cursor, model._meta.db_table)
+            for model in (Card, CardComment)
+        }
+    with connection.schema_editor() as editor:
+        for model, vector in ((Card, _card_vector()), (CardComment, _comment_vector())):
+            name = f'{model._meta.db_table}_search'
+            if name not in existing[model]:
+                editor.add_index(model, GinIndex(vector, name=name))
+
+
+def _ensure_sqlite_index(connection):
+    with connection.cursor() as cursor:
+        created = 'trello_search' not in connection.introspection.table_names(cursor)
+        cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS trello_search USING fts5(body, board_id UNINDEXED)')
+        for table, (kind, columns) in _SQLITE_TRIGGERS.items():
+            if created:
+                # Rows written before the index existed.
+                cursor.execute(f'INSERT INTO trello_search (rowid, body, board_id) '
+                               f'SELECT id * 2 + {kind}, {_sqlite_body(columns)}, board_id FROM {table}')
+            row = f"new.id * 2 + {kind}, {_sqlite_body(columns, 'new.')}, new.board_id"
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN '
+                           f'INSERT INTO trello_search (rowid, body, board_id) VALUES ({row}); END')
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE ON {table} BEGIN '
+                           f'DELETE FROM trello_search WHERE rowid = old.id * 2 + {kind}; '
+                           f'INSERT INTO trello_search (rowid, body, board_id) VALUES ({row}); END')
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN '
+                           f'DELETE FROM trello_search WHERE rowid = old.id * 2 + {kind}; END')
+
+
+def ensure_search_index(using='default', **kwargs):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        _ensure_postgres_index(connection)
+    elif connection.vendor == 'sqlite':
+        _ensure_sqlite_index(connection)
+
+
+def _search_postgres(query, board_ids, offset, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+    from django.db.models import Value
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    cards = Card.objects.annotate(search=_card_vector()).filter(search=search_query, board_id__in=board_ids) \
+        .annotate(rank=SearchRank(_card_vector(), search_query), kind=Value(CARD)).values_list('kind', 'id', 'rank')
+    comments = CardComment.objects.annotate(search=_comment_vector()) \
+        .filter(search=search_query, board_id__in=board_ids) \
+        .annotate(rank=SearchRank(_comment_vector(), search_query), kind=Value(COMMENT)) \
+        .values_list('kind', 'id', 'rank')
+    return list(cards.order_by().union(comments.order_by(), all=True).order_by('-rank')[offset:offset + limit])
+
+
+def _search_sqlite(connection, query, board_ids, offset, limit):
+    if not board_ids:
+        return []
+    match = ' '.join('"%s"' % term.replace('"', '""') for term in query.split())
+    placeholders = ', '.join(['%s'] * len(board_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, bm25(trello_search) AS score FROM trello_search '
+            f'WHERE trello_search MATCH %s AND board_id IN ({placeholders}) ORDER BY score LIMIT %s OFFSET %s',
+            [match, *board_ids, limit, offset])
+        rows = cursor.fetchall()
+    return [(COMMENT if rowid % 2 else CARD, rowid // 2, -score) for rowid, score in rows]
+
+
+def search_fallback(query, board_ids, offset, limit):
+    # Every term must appear; results are unranked, newest first.
+    card_filter, comment_filter = Q(), Q()
+    for term in query.split():
+        card_filter &= Q(name__icontains=term) | Q(description__icontains=term)
+        comment_filter &= Q(comment__icontains=term)
+    rank = Value(0.0, output_field=FloatField())
+    cards = Card.objects.filter(card_filter, board_id__in=board_ids) \
+        .annotate(kind=Value(CARD), rank=rank).values_list('kind', 'id', 'rank')
+    comments = CardComment.objects.filter(comment_filter, board_id__in=board_ids) \
+        .annotate(kind=Value(COMMENT), rank=rank).values_list('kind', 'id', 'rank')
+    return list(cards.order_by().union(comments.order_by(), all=True).order_by('-id')[offset:offset + limit])
+
+
+def search(query, board_ids, offset=0, limit=20, using='default'):
+    """
+    Returns ``(kind, id, rank)`` tuples for cards and comments on ``board_ids`` matching ``query``, best first.
+    """
+    connection = connections[using]
+    board_ids = list(board_ids)
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, board_ids, offset, limit)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(connection, query, board_ids, offset, limit)
+    return search_fallback(query, board_ids, offset, limit)
@@ -1,59 +1,67 @@
 from rest_framework import serializers
 
+from .instrumentation import TimedSerializerMixin
 from .models import Board, List, Card, CardAttachment, CardComment, CardTag
+from .optimizers import related
 
+datetime_field = serializers.DateTimeField()
 
-class BoardSerializer(serializers.ModelSerializer):
+
+class BoardSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Board
         fields = ['slug', 'name', 'description', 'is_active']
         read_only_fields = ['slug', 'created_by', 'created_at', 'updated_at']
 
 
-class ListSerializer(serializers.ModelSerializer):
+class ListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     board = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     board_name = serializers.SerializerMethodField()
 
     class Meta:
         model = List
-        fields = ['slug', 'board', 'board_name', 'name', 'description', 'is_active']
-        read_only_fields = ['slug', 'created_by', 'created_at', 'updated_at', 'board']
+        fields = ['slug', 'board', 'board_name', 'name', 'description', 'position', 'is_active']
+        read_only_fields = ['slug', 'created_by', 'created_at', 'updated_at', 'board', 'position']
 
+    @related('board')
     def get_board_name(self, obj):
         return obj.board.name
 
 
-class CardSerializer(serializers.ModelSerializer):
+class CardSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     list = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     list_name = serializers.SerializerMethodField()
     board_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Card
-        fields = ['slug', 'list', 'list_name', 'board_name', 'name', 'description', 'is_active']
-        read_only_fields = ['slug', 'created_by', 'created_at', 'updated_at', 'list']
+        fields = ['slug', 'list', 'list_name', 'board_name', 'name', 'description', 'position', 'is_active']
+        read_only_fields = ['slug', 'created_by', 'created_at', 'updated_at', 'list', 'position']
 
+    @related('list')
     def get_list_name(self, obj):
         return obj.list.name
 
+    @related('list__board')
     def get_board_name(self, obj):
         return obj.list.board.name
 
 
-class CardAttachmentSerializer(serializers.ModelSerializer):
+class CardAttachmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     card = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     card_name = serializers.SerializerMethodField()
 
     class Meta:
         model = CardAttachment
-        fields = ['slug', 'card', 'card_name', 'file', 'is_active']
-        read_only_fields = ['slug', 'uploaded_at', 'card']
+        fields = ['slug', 'card', 'card_name', 'file', 'name', 'is_active']
+        read_only_fields = ['slug', 'uploaded_at', 'card', 'name']
 
+    @related('card')
     def get_card_name(self, obj):
         return obj.card.name
 
 
-class CardCommentSerializer(serializers.ModelSerializer):
+class CardCommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     card = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     card_name = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
@@ -63,9 +71,11 @@ class CardCommentSerializer(serializers.ModelSerializer):
         fields = ['slug', 'card', 'comment', 'is_active', 'commented_at', 'user_name', 'card_name']
         read_only_fields = ['slug', 'commented_at', 'card']
 
+    @related('card')
     def get_card_name(self, obj):
         return obj.card.name
 
+    @related('user')
     def get_user_name(self, obj):
         return obj.user.first_name + ' ' + obj.user.sur_name
 
@@ -74,7 +84,7 @@ class CardCommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CardTagSerializer(serializers.ModelSerializer):
+class CardTagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     card = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     card_name = serializers.SerializerMethodField()
 
@@ -83,5 +93,43 @@ class CardTagSerializer(serializers.ModelSerializer):
         fields = ['slug', 'card', 'tag', 'is_active', 'card_name']
         read_only_fields = ['slug', 'card']
 
+    @related('card')
     def get_card_name(self, obj):
         return obj.card.name
+
+
+class RowSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Read-only serializer over ``values()`` rows holding ``lookups``. Subclasses mirror a model serializer and
+    must produce exactly its output, keys in the same order.
+    """
+    lookups = ()
+
+
+class ListRowSerializer(RowSerializer):
+    lookups = ('slug', 'board__slug', 'board__name', 'name', 'description', 'position', 'is_active')
+
+    def to_representation(self, row):
+        return {'slug': row['slug'], 'board': row['board__slug'], 'board_name': row['board__name'],
+                'name': row['name'], 'description': row['description'], 'position': row['position'],
+                'is_active': row['is_active']}
+
+
+class CardRowSerializer(RowSerializer):
+    lookups = ('slug', 'list__slug', 'list__name', 'list__board__name', 'name', 'description', 'position',
+               'is_active')
+
+    def to_representation(self, row):
+        return {'slug': row['slug'], 'list': row['list__slug'], 'list_name': row['list__name'],
+                'board_name': row['list__board__name'], 'name': row['name'], 'description': row['description'],
+                'position': row['position'], 'is_active': row['is_active']}
+
+
+class CardCommentRowSerializer(RowSerializer):
+    lookups = ('slug', 'card__slug', 'comment', 'is_active', 'commented_at', 'user__first_name', 'user__sur_name',
+               'card__name')
+
+    def to_representation(self, row):
+        return {'slug': row['slug'], 'card': row['card__slug'], 'comment': row['comment'],
+                'is_active': row['is_active'], 'commented_at': datetime_field.to_representation(row['commented_at']),
+                'user_name': row['user__first_name'] + ' ' + row['user__sur_name'], 'card_name': row['card__name']}
@@ -0,0 +1,108 @@
+import copy
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.utils.encoders import JSONEncoder
+
+from users.models import StatelessUser
+from .blobs import release_blobs
+from .changes import record_changes
+from .events import get_event_layer
+from .membership import invalidate_memberships
+from .models import Board, BoardChange, BoardMember, List, Card, CardAttachment, CardComment, CardTag, \
+    AttachmentUpload, card_moved
+from .uploads import delete_upload_files
+from .serializers import ListSerializer, CardSerializer, CardAttachmentSerializer, CardCommentSerializer, \
+    CardTagSerializer
+
+BOARD_CHILD_MODELS = (List, Card, CardAttachment, CardComment, CardTag, BoardMember)
+
+EVENT_SERIALIZERS = {
+    List: ('list', ListSerializer),
+    Card: ('card', CardSerializer),
+    CardAttachment: ('attachment', CardAttachmentSerializer),
+    CardComment: ('comment', CardCommentSerializer),
+    CardTag: ('tag', CardTagSerializer),
+}
+
+
+@receiver([post_save, post_delete], sender=BoardMember)
+def board_member_changed(sender, instance, **kwargs):
+    invalidate_memberships(instance.user_id, instance._state.fields_cache.get('user'))
+
+
+@receiver(post_delete, sender=CardAttachment)
+def attachment_deleted(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blobs([instance.blob_id])
+
+
+@receiver(post_delete, sender=AttachmentUpload)
+def upload_deleted(sender, instance, **kwargs):
+    # Covers uploads removed along with their card; finalized uploads have already moved their file.
+    slugs = [instance.slug]
+    transaction.on_commit(lambda: delete_upload_files(slugs))
+
+
+def publish_change(instance, action):
+    layer = get_event_layer()
+    if type(instance) not in EVENT_SERIALIZERS or not layer.has_subscribers(instance.board_id):
+        return
+    name, serializer_class = EVENT_SERIALIZERS[type(instance)]
+    event = {'type': f'{name}.{action}', 'slug': instance.slug}
+    if action != 'deleted':
+        event['data'] = serializer_class(instance).data
+    board_id, payload = instance.board_id, json.dumps(event, cls=JSONEncoder)
+    transaction.on_commit(lambda: layer.publish(board_id, payload))
+
+
+def notify_changes(instances, action):
+    """
+    Bumps board versions, logs the changes and publishes events for ``instances``. Bulk writes that bypass
+    model signals call this directly.
+    """
+    if not instances:
+        return
+    Board.bump_version(*{instance.board_id for instance in instances})
+    record_changes(instances, action)
+    for instance in instances:
+        publish_change(instance, action)
+
+
+def board_child_changed(sender, instance, signal, created=False, origin=None, **kwargs):
+    # Cascades started from a board, list or card are covered by the origin's own signal.
+    if (isinstance(origin, (Board, List, Card)) and origin is not instance) or getattr(instance, '_moving', False):
+        return
+    if signal is post_delete:
+        action = BoardChange.DELETED
+    else:
+        action = BoardChange.CREATED if created else BoardChange.UPDATED
+    notify_changes([instance], action)
+
+
+for model in BOARD_CHILD_MODELS:
+    post_save.connect(board_child_changed, sender=model, dispatch_uid=f'bump_version_{model.__name__}')
+    post_delete.connect(board_child_changed, sender=model, dispatch_uid=f'bump_version_{model.__name__}')
+
+
+@receiver(card_moved, sender=Card)
+def card_changed_board(sender, instance, previous_board_id, **kwargs):
+    # The old board sees the card and its children deleted, the new one sees them created.
+    moved = [instance, *instance.attachments.all(), *instance.comments.select_related('user'), *instance.tags.all()]
+    tombstones = [copy.copy(row) for row in moved]
+    for row in tombstones:
+        row.board_id = previous_board_id
+    notify_changes(tombstones, BoardChange.DELETED)
+    notify_changes(moved, BoardChange.CREATED)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_save, sender=StatelessUser)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Comment and member payloads embed user names.
+    if created or (update_fields is not None and not {'first_name', 'sur_name'} & set(update_fields)):
+        return
+    Board.bump_version(*BoardMember.objects.filter(user=instance).values_list('board_id', flat=True))
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from .models import BoardMember, List, Card, CardTag, CardComment, CardAttachment
+
+SNAPSHOT_MAX_DEPTH = 3
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _group_by(rows, key):
+    groups = defaultdict(list)
+    for row in rows:
+        groups[row.pop(key)].append(row)
+    return groups
+
+
+def _members(board):
+    rows = BoardMember.objects.filter(board=board, is_active=True).values(
+        'user__slug', 'user__first_name', 'user__sur_name', 'is_admin', 'joined_at')
+    return [{
+        'user': row['user__slug'],
+        'user_name': row['user__first_name'] + ' ' + row['user__sur_name'],
+        'is_admin': row['is_admin'],
+        'joined_at': _datetime_field.to_representation(row['joined_at']),
+    } for row in rows]
+
+
+def _card_children(board, request):
+    tags = _group_by(CardTag.objects.filter(board=board).values('card_id', 'slug', 'tag', 'is_active'), 'card_id')
+    comments = CardComment.objects.filter(board=board).values(
+        'card_id', 'slug', 'comment', 'is_active', 'commented_at', 'user__first_name', 'user__sur_name')
+    comments = _group_by([{
+        'card_id': row['card_id'],
+        'slug': row['slug'],
+        'comment': row['comment'],
+        'is_active': row['is_active'],
+        'commented_at': _datetime_field.to_representation(row['commented_at']),
+        'user_name': row['user__first_name'] + ' ' + row['user__sur_name'],
+    } for row in comments], 'card_id')
+    attachments = CardAttachment.objects.filter(board=board).values('card_id', 'slug', 'file', 'is_active')
+    attachments = _group_by([{
+        'card_id': row['card_id'],
+        'slug': row['slug'],
+        'file': _file_url(row['file'], request),
+        'is_active': row['is_active'],
+    } for row in attachments], 'card_id')
+    return tags, comments, attachments
+
+
+def _file_url(name, request):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def build_board_snapshot(board, depth=SNAPSHOT_MAX_DEPTH, request=None):
+    """
+    Assembles the board tree with one query per level: members, lists, cards and the card children.
+
+    ``depth`` limits the tree: 0 is the board and its members, 1 adds lists, 2 adds cards and 3 adds tags,
+    comments and attachments.
+    """
+    snapshot = {
+        'slug': board.slug,
+        'name': board.name,
+        'description': board.description,
+        'is_active': board.is_active,
+        'members': _members(board),
+    }
+    if depth < 1:
+        return snapshot
+
+    lists = list(List.objects.filter(board=board).order_by('position', 'id').values(
+        'id', 'slug', 'name', 'description', 'position', 'is_active'))
+    snapshot['lists'] = lists
+    if depth < 2:
+        for board_list in lists:
+            del board_list['id']
+        return snapshot
+
+    cards = _group_by(Card.objects.filter(board=board).order_by('position', 'id').values(
+        'id', 'list_id', 'slug', 'name', 'description', 'position', 'is_active'), 'list_id')
+    if depth >= 3:
+        tags, comments, attachments = _card_children(board, request)
+    for board_list in lists:
+        board_list['cards'] = cards.get(board_list.pop('id'), [])
+        for card in board_list['cards']:
+            card_id = card.pop('id')
+            if depth >= 3:
+                card['tags'] = tags.get(card_id, [])
+                card['comments'] = comments.get(card_id, [])
+                card['attachments'] = attachments.get(card_id, [])
+    return snapshot
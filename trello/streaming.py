@@ -0,0 +1,67 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from .events import DROPPED, get_event_layer
+from .models import Board
+
+KEEPALIVE_INTERVAL = getattr(settings, 'TRELLO_EVENT_KEEPALIVE', 15)
+
+
+def _authenticate(request):
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _member_board(request, slug):
+    user = _authenticate(request)
+    if user is None:
+        raise AuthenticationFailed()
+    board = Board.objects.filter(slug=slug).first()
+    if board is None or not board.is_member(user):
+        return None
+    return board
+
+
+async def _event_stream(subscription):
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await subscription.get(timeout=KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is DROPPED:
+                yield 'event: dropped\ndata: {}\n\n'
+                return
+            yield f'data: {event}\n\n'
+    finally:
+        subscription.close()
+
+
+async def board_events(request, slug):
+    """
+    Streams the board's change events as server-sent events. Serve it over ASGI.
+
+    Clients that fall behind receive a ``dropped`` event and should reload the board (for example with the
+    snapshot or changes endpoint) before reconnecting.
+    """
+    try:
+        board = await sync_to_async(_member_board)(request, slug)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+    if board is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    subscription = get_event_layer().subscribe(board.pk)
+    response = StreamingHttpResponse(_event_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
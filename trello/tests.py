@@ -1,3 +1,830 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import pstats
+import tempfile
+from contextlib import nullcontext
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.asgi import application
+from users.models import User
+from users.tokens import UserRefreshToken
+from .benchmarks import benchmark_encoding, benchmark_serializers, compare_to_baseline, generate_scale_data, \
+    run_benchmarks
+from .events import DROPPED, InMemoryEventLayer, get_event_layer
+from .models import Board, BoardMember, List, Card, CardComment, CardTag, CardAttachment, CardMember, AttachmentBlob, \
+    AttachmentUpload, BoardChange
+from .membership import get_memberships
+from .optimizers import get_queryset_plan, optimize_queryset
+from .profiling import profile_store
+from .purge import purge_board, purge_list
+from .renderers import FastJSONParser, FastJSONRenderer, dumps, iter_json
+from .search import ensure_search_index, search_fallback
+from .serializers import CardSerializer, CardCommentSerializer, ListSerializer, CardRowSerializer, \
+    CardCommentRowSerializer, ListRowSerializer
+from .uploads import OffsetMismatch, UploadError, append_chunk, finalize_upload, start_upload, upload_path
+
+
+class TrelloTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='owner@example.com', password='secret123', first_name='Ada',
+                                             sur_name='Lovelace')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(name='Board', created_by=self.user)
+        BoardMember.objects.create(board=self.board, user=self.user, is_admin=True)
+
+    def create_cards(self, count):
+        board_list = List.objects.create(board=self.board, name='List', created_by=self.user)
+        for index in range(count):
+            card = Card.objects.create(list=board_list, name=f'Card {index}', created_by=self.user)
+            CardComment.objects.create(card=card, user=self.user, comment='Comment')
+            CardTag.objects.create(card=card, tag='Tag')
+            CardAttachment.objects.create(card=card, file='attachments/file.txt')
+
+
+class QuerysetOptimizerTests(TrelloTestCase):
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_plan_is_derived_from_serializer_fields(self):
+        self.assertEqual(get_queryset_plan(CardSerializer), (['list', 'list__board'], []))
+        self.assertEqual(get_queryset_plan(CardCommentSerializer), (['card', 'user'], []))
+
+    def test_list_endpoints_run_a_constant_number_of_queries(self):
+        urls = ['/api/boards/', '/api/lists/', '/api/cards/', '/api/attachments/', '/api/comments/', '/api/tags/']
+        self.create_cards(2)
+        counts = {url: self.count_queries(url) for url in urls}
+        self.create_cards(10)
+        for url in urls:
+            self.assertEqual(self.count_queries(url), counts[url], url)
+            self.assertLessEqual(counts[url], 2, url)
+
+
+class RowSerializerTests(TrelloTestCase):
+    def test_row_serializers_render_the_same_json_as_model_serializers(self):
+        self.create_cards(3)
+        renderer = JSONRenderer()
+        pairs = [(List, ListSerializer, ListRowSerializer), (Card, CardSerializer, CardRowSerializer),
+                 (CardComment, CardCommentSerializer, CardCommentRowSerializer)]
+        for model, serializer_class, row_serializer_class in pairs:
+            queryset = model.objects.order_by('-id')
+            expected = serializer_class(optimize_queryset(queryset, serializer_class), many=True).data
+            rows = row_serializer_class(optimize_queryset(queryset, row_serializer_class), many=True).data
+            self.assertEqual(renderer.render(rows), renderer.render(expected), model.__name__)
+
+    def test_list_endpoints_use_row_serializers(self):
+        self.create_cards(2)
+        card = Card.objects.order_by('-id').select_related('list__board').first()
+        for url, serializer_class, model_serializer_class in (
+                ('/api/lists/', ListRowSerializer, ListSerializer), ('/api/cards/', CardRowSerializer, CardSerializer),
+                ('/api/comments/', CardCommentRowSerializer, CardCommentSerializer)):
+            with mock.patch.object(serializer_class, 'to_representation', autospec=True,
+                                   side_effect=serializer_class.to_representation) as row_representation, \
+                    mock.patch.object(model_serializer_class, 'to_representation', autospec=True,
+                                      side_effect=model_serializer_class.to_representation) as model_representation:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(row_representation.called, url)
+            self.assertIsInstance(row_representation.call_args.args[1], dict)
+            model_representation.assert_not_called()
+        self.assertEqual(self.client.get('/api/cards/').data['results'][0], CardSerializer(card).data)
+
+
+class MembershipCacheTests(TrelloTestCase):
+    def test_memberships_are_cached_until_a_membership_changes(self):
+        user, later_request = User.objects.get(pk=self.user.pk), User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_memberships(user), {self.board.pk: True})
+        with self.assertNumQueries(0):
+            get_memberships(user)
+            self.assertEqual(get_memberships(later_request), {self.board.pk: True})
+
+        other = Board.objects.create(name='Other', created_by=self.user)
+        member = BoardMember.objects.create(board=other, user=user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_memberships(user), {self.board.pk: True, other.pk: False})
+        member.is_admin = True
+        member.save()
+        later_request = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_memberships(later_request), {self.board.pk: True, other.pk: True})
+        member.delete()
+        self.assertEqual(get_memberships(User.objects.get(pk=self.user.pk)), {self.board.pk: True})
+
+
+class CursorPaginationTests(TrelloTestCase):
+    def test_cards_are_paginated_by_cursor(self):
+        self.create_cards(5)
+        url, slugs = '/api/cards/?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            slugs.extend(card['slug'] for card in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(slugs, list(Card.objects.order_by('-id').values_list('slug', flat=True)))
+
+
+class DenormalizedBoardTests(TrelloTestCase):
+    def test_card_move_updates_board_of_children(self):
+        self.create_cards(1)
+        card = Card.objects.get()
+        other_board = Board.objects.create(name='Other', created_by=self.user)
+        card.list = List.objects.create(board=other_board, name='Other list', created_by=self.user)
+        card.save()
+        for model in (Card, CardComment, CardTag, CardAttachment):
+            self.assertEqual(set(model.objects.values_list('board_id', flat=True)), {other_board.id})
+
+
+class BoardSnapshotTests(TrelloTestCase):
+    def test_snapshot_runs_one_query_per_level(self):
+        self.create_cards(3)
+        url = f'/api/boards/{self.board.slug}/snapshot/'
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        card = response.data['lists'][0]['cards'][0]
+        self.assertEqual(len(response.data['lists'][0]['cards']), 3)
+        self.assertEqual(card['comments'][0]['user_name'], 'Ada Lovelace')
+        self.assertEqual(card['tags'][0]['tag'], 'Tag')
+
+    def test_snapshot_depth_limit(self):
+        self.create_cards(1)
+        response = self.client.get(f'/api/boards/{self.board.slug}/snapshot/?depth=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('cards', response.data['lists'][0])
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.slug}/snapshot/?depth=9').status_code, 400)
+
+
+class BoardVersionETagTests(TrelloTestCase):
+    def test_writes_bump_board_version(self):
+        version = Board.objects.get().version
+        self.create_cards(1)
+        self.assertGreater(Board.objects.get().version, version)
+
+    def test_conditional_get_returns_not_modified_until_board_changes(self):
+        self.create_cards(1)
+        for url in [f'/api/boards/{self.board.slug}/', f'/api/boards/{self.board.slug}/snapshot/', '/api/cards/']:
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            CardTag.objects.create(card=Card.objects.get(), tag='New')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_responses_are_cached_until_a_board_changes(self):
+        self.create_cards(2)
+        first = self.client.get('/api/cards/').json()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/cards/').json(), first)
+
+        card = Card.objects.first()
+        card.name = 'Renamed'
+        card.save()
+        self.assertIn('Renamed', [item['name'] for item in self.client.get('/api/cards/').json()['results']])
+
+        other_board = Board.objects.create(name='Other', created_by=self.user)
+        other_list = List.objects.create(board=other_board, name='List', created_by=self.user)
+        card.list = other_list
+        card.save()
+        self.assertNotIn(card.slug, [item['slug'] for item in self.client.get('/api/cards/').json()['results']])
+
+
+class PositionTests(TrelloTestCase):
+    def test_move_card_between_neighbours_in_another_list(self):
+        self.create_cards(3)
+        target = List.objects.create(board=self.board, name='Target', created_by=self.user)
+        first = Card.objects.create(list=target, name='First', created_by=self.user)
+        last = Card.objects.create(list=target, name='Last', created_by=self.user)
+        card = Card.objects.exclude(list=target).first()
+        response = self.client.post(f'/api/cards/{card.slug}/move/',
+                                    {'list': target.slug, 'before': first.slug, 'after': last.slug})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(target.cards.order_by('position').values_list('slug', flat=True)),
+                         [first.slug, card.slug, last.slug])
+
+    def test_move_list_to_front(self):
+        lists = [List.objects.create(board=self.board, name=f'List {index}', created_by=self.user)
+                 for index in range(3)]
+        response = self.client.post(f'/api/lists/{lists[2].slug}/move/', {'after': lists[0].slug})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.board.lists.order_by('position').values_list('slug', flat=True)),
+                         [lists[2].slug, lists[0].slug, lists[1].slug])
+
+
+class SearchTests(TrelloTestCase):
+    def test_search_is_ranked_and_scoped_to_member_boards(self):
+        board_list = List.objects.create(board=self.board, name='List', created_by=self.user)
+        card = Card.objects.create(list=board_list, name='Release plan', description='release release',
+                                   created_by=self.user)
+        CardComment.objects.create(card=card, user=self.user, comment='Moved the release to Friday')
+        other_board = Board.objects.create(name='Private', created_by=self.user)
+        other_list = List.objects.create(board=other_board, name='List', created_by=self.user)
+        Card.objects.create(list=other_list, name='Release', created_by=self.user)
+
+        response = self.client.get('/api/search/?q=release')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['type'] for result in response.data['results']], ['card', 'comment'])
+        self.assertEqual(response.data['results'][0]['card']['slug'], card.slug)
+
+        card.name, card.description = 'Roadmap', ''
+        card.save()
+        response = self.client.get('/api/search/?q=release&page_size=1')
+        self.assertEqual([result['type'] for result in response.data['results']], ['comment'])
+        self.assertIsNone(response.data['next'])
+
+    def test_existing_rows_are_indexed_and_other_backends_fall_back(self):
+        board_list = List.objects.create(board=self.board, name='List', created_by=self.user)
+        card = Card.objects.create(list=board_list, name='Release plan', created_by=self.user)
+        comment = CardComment.objects.create(card=card, user=self.user, comment='Release notes are ready')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE trello_search')
+        ensure_search_index()
+
+        response = self.client.get('/api/search/?q=release')
+        self.assertEqual([result['type'] for result in response.data['results']], ['card', 'comment'])
+        self.assertEqual(search_fallback('release READY', [self.board.pk], 0, 10), [('comment', comment.pk, 0.0)])
+        self.assertEqual(search_fallback('release', [], 0, 10), [])
+
+
+class EventLayerTests(TrelloTestCase):
+    def test_model_saves_are_published_to_board_subscribers(self):
+        def create_list():
+            with self.captureOnCommitCallbacks(execute=True):
+                return List.objects.create(board=self.board, name='Backlog', created_by=self.user)
+
+        async def scenario():
+            subscription = get_event_layer().subscribe(self.board.pk)
+            board_list = await sync_to_async(create_list)()
+            event = json.loads(await subscription.get(timeout=1))
+            subscription.close()
+            return board_list, event
+
+        board_list, event = async_to_sync(scenario)()
+        self.assertEqual(event['type'], 'list.created')
+        self.assertEqual(event['data']['slug'], board_list.slug)
+
+    def test_slow_consumer_is_dropped(self):
+        async def scenario():
+            layer = InMemoryEventLayer(queue_size=2)
+            subscription = layer.subscribe(1)
+            for index in range(3):
+                layer.publish(1, str(index))
+            await asyncio.sleep(0)
+            self.assertIs(await subscription.get(timeout=1), DROPPED)
+            self.assertFalse(layer.has_subscribers(1))
+
+        asyncio.run(scenario())
+
+
+class BoardEventStreamTests(TransactionTestCase):
+    def test_events_are_streamed_over_asgi_until_the_client_falls_behind(self):
+        user = User.objects.create_user(email='owner@example.com', password='secret123', first_name='Ada',
+                                        sur_name='Lovelace')
+        board = Board.objects.create(name='Board', created_by=user)
+        BoardMember.objects.create(board=board, user=user, is_admin=True)
+        token = UserRefreshToken.for_user(user).access_token
+        path = f'/api/boards/{board.slug}/events/'
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                 'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+                 'client': ('127.0.0.1', 1000), 'server': ('testserver', 80)}
+
+        async def scenario():
+            sent, disconnected = asyncio.Queue(), asyncio.Event()
+            requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if requests:
+                    return requests.pop()
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def next_message():
+                return await asyncio.wait_for(sent.get(), 5)
+
+            app = asyncio.ensure_future(application(scope, receive, sent.put))
+            start = await next_message()
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'Content-Type', b'text/event-stream'), start['headers'])
+            self.assertEqual((await next_message())['body'], b'retry: 3000\n\n')
+
+            board_list = await sync_to_async(List.objects.create)(board=board, name='Backlog', created_by=user)
+            event = (await next_message())['body'].decode()
+            self.assertTrue(event.startswith('data: '), event)
+            self.assertEqual(json.loads(event[6:])['data']['slug'], board_list.slug)
+
+            layer = get_event_layer()
+            for index in range(layer.queue_size + 1):
+                layer.publish(board.pk, str(index))
+            self.assertEqual((await next_message())['body'], b'event: dropped\ndata: {}\n\n')
+            while (await next_message()).get('more_body'):
+                pass
+            self.assertFalse(layer.has_subscribers(board.pk))
+            disconnected.set()
+            await asyncio.wait_for(app, 5)
+
+        async_to_sync(scenario)()
+
+
+class BoardChangesTests(TrelloTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('trello.changes.CHANGES_CURSOR_MARGIN', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_changes(self, since):
+        response = self.client.get(f'/api/boards/{self.board.slug}/changes/?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_changes_since_cursor_include_tombstones(self):
+        self.create_cards(2)
+        cursor = self.get_changes(0)['cursor']
+        card, other = Card.objects.all()
+        card.name = 'Renamed'
+        card.save()
+        card.save()
+        tag_slug = other.tags.get().slug
+        other.tags.get().delete()
+
+        payload = self.get_changes(cursor)
+        self.assertEqual([(change['type'], change['action'], change['slug']) for change in payload['changes']],
+                         [('card', 'updated', card.slug), ('tag', 'deleted', tag_slug)])
+        self.assertEqual(payload['changes'][0]['data']['name'], 'Renamed')
+        self.assertEqual(self.get_changes(payload['cursor'])['changes'], [])
+
+    def test_small_batches_report_the_same_latest_changes(self):
+        self.create_cards(3)
+        for card in Card.objects.all():
+            card.name = 'Renamed'
+            card.save()
+        Card.objects.first().tags.get().delete()
+        expected = self.get_changes(0)['changes']
+        with mock.patch('trello.changes.CHANGES_BATCH_SIZE', 2):
+            self.assertEqual(self.get_changes(0)['changes'], expected)
+        self.assertEqual(len({(change['type'], change['slug']) for change in expected}), len(expected))
+
+    def test_moving_a_card_logs_it_and_its_children_on_both_boards(self):
+        self.create_cards(1)
+        card = Card.objects.get()
+        other_board = Board.objects.create(name='Other', created_by=self.user)
+        BoardMember.objects.create(board=other_board, user=self.user, is_admin=True)
+        cursor = self.get_changes(0)['cursor']
+        card.list = List.objects.create(board=other_board, name='Other list', created_by=self.user)
+        card.save()
+
+        moved = {('card', card.slug), ('comment', card.comments.get().slug), ('tag', card.tags.get().slug),
+                 ('attachment', card.attachments.get().slug)}
+        changes = self.get_changes(cursor)['changes']
+        self.assertEqual({(change['type'], change['slug']) for change in changes}, moved)
+        self.assertEqual({change['action'] for change in changes}, {'deleted'})
+        response = self.client.get(f'/api/boards/{other_board.slug}/changes/?since=0')
+        changes = json.loads(b''.join(response.streaming_content))['changes']
+        self.assertEqual({(change['type'], change['slug']) for change in changes if change['type'] != 'list'}
+                         - {('member', self.user.slug)}, moved)
+        self.assertTrue(all(change['action'] == 'created' for change in changes if change['type'] != 'member'))
+
+    def test_cursor_stays_behind_recent_changes_and_purged_cursors_expire(self):
+        self.create_cards(1)
+        BoardChange.objects.update(changed_at=timezone.now() - timedelta(days=2))
+        settled = BoardChange.objects.latest().pk
+        card = Card.objects.get()
+        card.save()
+        with mock.patch('trello.changes.CHANGES_CURSOR_MARGIN', 60):
+            payload = self.get_changes(0)
+        self.assertEqual(payload['cursor'], settled)
+        self.assertEqual(payload['changes'][-1]['slug'], card.slug)
+
+        output = StringIO()
+        call_command('purge_board_changes', days=1, batch_size=2, stdout=output)
+        self.assertEqual(BoardChange.objects.get().slug, card.slug)
+        self.assertEqual(self.client.get(f'/api/boards/{self.board.slug}/changes/?since=0').status_code, 410)
+        self.assertEqual(self.get_changes(settled)['changes'][0]['slug'], card.slug)
+
+
+class BulkTests(TrelloTestCase):
+    def test_bulk_create_update_and_delete_cards(self):
+        board_list = List.objects.create(board=self.board, name='List', created_by=self.user)
+        items = [{'list': board_list.slug, 'name': f'Card {index}'} for index in range(20)]
+        response = self.client.post('/api/cards/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Card.objects.count(), 20)
+        self.assertEqual(CardMember.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(list(board_list.cards.order_by('position').values_list('name', flat=True)),
+                         [item['name'] for item in items])
+
+        slugs = [card['slug'] for card in response.data]
+        response = self.client.patch('/api/cards/bulk/', [{'slug': slug, 'name': 'Done'} for slug in slugs[:5]],
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Card.objects.filter(name='Done').count(), 5)
+
+        CardTag.objects.create(card=Card.objects.get(slug=slugs[0]), tag='Tag')
+        response = self.client.delete('/api/cards/bulk/', slugs[:10], format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Card.objects.count(), 10)
+        self.assertFalse(CardTag.objects.exists())
+
+    def test_bulk_errors_are_reported_per_item_and_nothing_is_written(self):
+        self.create_cards(1)
+        card = Card.objects.get()
+        response = self.client.post('/api/tags/bulk/', [
+            {'card': card.slug, 'tag': 'Ok'},
+            {'card': 'missing', 'tag': 'Orphan'},
+            {'card': card.slug},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {})
+        self.assertIn('card', response.data['errors'][1])
+        self.assertIn('tag', response.data['errors'][2])
+        self.assertEqual(CardTag.objects.count(), 1)
+
+
+class PurgeTests(TrelloTestCase):
+    def test_board_delete_hides_board_and_purge_removes_descendants(self):
+        self.create_cards(3)
+        response = self.client.delete(f'/api/boards/{self.board.slug}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/cards/').data['results'], [])
+        self.assertTrue(Card.objects.exists())
+
+        call_command('purge_deleted_boards', batch_size=2, stdout=StringIO())
+        for model in (Board, BoardMember, List, Card, CardMember, CardComment, CardTag, CardAttachment):
+            self.assertFalse(model.objects.exists(), model)
+
+    def test_list_delete_purges_cards(self):
+        self.create_cards(3)
+        board_list = List.objects.get()
+        self.assertEqual(self.client.delete(f'/api/lists/{board_list.slug}/').status_code, 204)
+        self.assertFalse(Card.objects.exists())
+        self.assertFalse(CardComment.objects.exists())
+
+
+class PortabilityTests(TrelloTestCase):
+    def test_export_and_import_round_trip(self):
+        self.create_cards(3)
+        response = self.client.get(f'/api/boards/{self.board.slug}/export/')
+        self.assertEqual(response.status_code, 200)
+        export = b''.join(response.streaming_content)
+
+        upload = SimpleUploadedFile('board.ndjson', export, content_type='application/x-ndjson')
+        response = self.client.post('/api/boards/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        board = Board.objects.get(slug=response.data['slug'])
+        self.assertNotEqual(board.pk, self.board.pk)
+        for model in (List, Card, CardComment, CardTag):
+            self.assertEqual(model.objects.filter(board=board).count(), model.objects.filter(board=self.board).count())
+        # Legacy attachments have no blob to import from.
+        self.assertFalse(CardAttachment.objects.filter(board=board).exists())
+        self.assertFalse(Card.objects.filter(board=board, slug__in=Card.objects.filter(board=self.board)
+                                             .values('slug')).exists())
+        self.assertTrue(board.is_admin(self.user))
+
+    def test_import_only_trusts_colleagues_and_stored_blobs(self):
+        colleague = User.objects.create_user(email='colleague@example.com', password='secret123', first_name='Grace',
+                                             sur_name='Hopper')
+        stranger = User.objects.create_user(email='stranger@example.com', password='secret123', first_name='Eve',
+                                            sur_name='Smith')
+        BoardMember.objects.create(board=self.board, user=colleague)
+        blob = AttachmentBlob.objects.create(sha256='a' * 64, file='blobs/aa/aa/' + 'a' * 64, size=1)
+        rows = [
+            {'type': 'board', 'name': 'Imported'},
+            {'type': 'member', 'user': colleague.email, 'is_active': True, 'is_admin': True},
+            {'type': 'member', 'user': stranger.email, 'is_active': True, 'is_admin': True},
+            {'type': 'list', 'slug': 'l', 'name': 'List', 'description': '', 'position': 'a', 'is_active': True,
+             'created_by': stranger.email},
+            {'type': 'card', 'slug': 'c', 'list': 'l', 'name': 'Card', 'description': '', 'position': 'a',
+             'is_active': True, 'created_by': colleague.email},
+            {'type': 'comment', 'slug': 'm', 'card': 'c', 'user': stranger.email, 'comment': 'Hi', 'is_active': True},
+            {'type': 'attachment', 'slug': 'a', 'card': 'c', 'file': 'uploads/other.part', 'is_active': True},
+            {'type': 'attachment', 'slug': 'b', 'card': 'c', 'file': 'uploads/other.part', 'sha256': blob.sha256,
+             'is_active': True},
+        ]
+        upload = SimpleUploadedFile('board.ndjson', ''.join(json.dumps(row) + '\n' for row in rows).encode())
+        response = self.client.post('/api/boards/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        board = Board.objects.get(slug=response.data['slug'])
+        self.assertEqual(dict(BoardMember.objects.filter(board=board).values_list('user__email', 'is_admin')),
+                         {self.user.email: True, colleague.email: False})
+        self.assertEqual(CardComment.objects.get(board=board).user, self.user)
+        self.assertEqual(Card.objects.get(board=board).created_by, colleague)
+        attachment = CardAttachment.objects.get(board=board)
+        self.assertEqual((attachment.blob_id, attachment.file.name), (blob.pk, blob.file.name))
+        self.assertEqual(response.data['skipped_attachments'], [{'slug': 'a', 'card': 'c', 'name': ''}])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_invalid_rows_are_rejected_with_their_line(self):
+        rows = [
+            {'type': 'board', 'name': 'Imported'},
+            {'type': 'list', 'slug': 'l', 'name': 'List', 'description': '', 'position': 'a', 'is_active': True,
+             'created_by': self.user.email},
+        ]
+        for bad_row, error in (
+                ({'type': 'card', 'slug': 'c', 'list': 'missing', 'name': 'Card', 'description': '', 'position': 'a',
+                  'is_active': True, 'created_by': self.user.email}, "Line 3: Unknown list 'missing'."),
+                ({'type': 'tag', 'card': 'c', 'tag': 'Tag', 'is_active': True}, "Line 3: Unknown card 'c'."),
+                ({'type': 'list', 'slug': 'm', 'name': 'List', 'position': 'b', 'is_active': True,
+                  'created_by': self.user.email}, "Line 3: 'description' is required."),
+                ({'type': 'list', 'slug': 'm', 'name': 'List', 'description': '', 'position': 'b', 'is_active': 'maybe',
+                  'created_by': self.user.email}, "Line 3: 'is_active':")):
+            lines = ''.join(json.dumps(row) + '\n' for row in rows + [bad_row]).encode()
+            upload = SimpleUploadedFile('board.ndjson', lines)
+            response = self.client.post('/api/boards/import/', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.data['file'].startswith(error), response.data)
+        self.assertFalse(Board.objects.filter(name='Imported').exists())
+
+
+class CopyBoardTests(TrelloTestCase):
+    def test_copy_uses_a_constant_number_of_queries(self):
+        url = f'/api/boards/{self.board.slug}/copy/'
+        payload = {'name': 'Sprint', 'include_comments': True, 'include_attachments': True}
+        blob = AttachmentBlob.objects.create(sha256='a' * 64, file='blobs/aa/aa/' + 'a' * 64, size=1)
+        self.create_cards(2)
+        CardAttachment.objects.update(blob=blob)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.post(url, payload, format='json').status_code, 201)
+        self.create_cards(10)
+        CardAttachment.objects.filter(board=self.board).update(blob=blob)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(len(small), len(large))
+        board = Board.objects.get(slug=response.data['slug'])
+        self.assertEqual(board.name, 'Sprint')
+        for model in (List, Card, CardComment, CardTag, CardAttachment):
+            self.assertEqual(model.objects.filter(board=board).count(), model.objects.filter(board=self.board).count())
+        self.assertEqual(CardMember.objects.filter(card__board=board, user=self.user).count(), 12)
+
+    def test_legacy_attachments_are_copied_once_adopted(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        url = f'/api/boards/{self.board.slug}/copy/'
+        with override_settings(MEDIA_ROOT=media_root.name):
+            name = default_storage.save('attachments/legacy.txt', BytesIO(b'legacy'))
+            self.create_cards(1)
+            CardAttachment.objects.update(file=name)
+            response = self.client.post(url, {'include_attachments': True}, format='json')
+            self.assertFalse(CardAttachment.objects.filter(board__slug=response.data['slug']).exists())
+            source = CardAttachment.objects.get(board=self.board)
+            self.assertEqual((source.blob_id, source.file.name), (None, name))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('adopt_legacy_attachments', stdout=StringIO())
+            response = self.client.post(url, {'include_attachments': True}, format='json')
+            source, copy = CardAttachment.objects.get(board=self.board), \
+                CardAttachment.objects.get(board__slug=response.data['slug'])
+            self.assertEqual((copy.blob_id, copy.blob.ref_count), (source.blob_id, 2))
+            self.assertFalse(default_storage.exists(name))
+            with self.captureOnCommitCallbacks(execute=True):
+                purge_board(self.board.pk)
+            with default_storage.open(copy.file.name) as stored:
+                self.assertEqual(stored.read(), b'legacy')
+
+
+class AttachmentUploadTests(TrelloTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_cards(1)
+        self.card = Card.objects.get()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        for patcher in (override_settings(MEDIA_ROOT=media_root.name),
+                        mock.patch('trello.uploads.UPLOAD_TEMP_DIR', os.path.join(media_root.name, 'uploads'))):
+            patcher.__enter__()
+            self.addCleanup(patcher.__exit__, None, None, None)
+
+    def upload(self, data, chunk_size):
+        response = self.client.post('/api/attachments/uploads/', {'card': self.card.slug, 'name': 'notes.txt',
+                                                                   'size': len(data)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/attachments/uploads/{response.data['upload']}/"
+        response = self.client.put(url, data[chunk_size:], content_type='application/octet-stream',
+                                   headers={'Upload-Offset': str(chunk_size)})
+        self.assertEqual((response.status_code, response.data['offset']), (409, 0))
+        for offset in range(0, len(data), chunk_size):
+            response = self.client.put(url, data[offset:offset + chunk_size], content_type='application/octet-stream',
+                                       headers={'Upload-Offset': str(response.data['offset'])})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data['offset'], len(data))
+        return self.client.post(url + 'finalize/', {'sha256': hashlib.sha256(data).hexdigest()}, format='json')
+
+    def test_chunked_uploads_are_deduplicated(self):
+        data = b'0123456789' * 100
+        first, second = self.upload(data, 300), self.upload(data, 700)
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(first.data['file'], second.data['file'])
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(data)))
+        with default_storage.open(blob.file.name) as stored:
+            self.assertEqual(stored.read(), data)
+
+        CardAttachment.objects.get(slug=first.data['slug']).delete()
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/attachments/{second.data['slug']}/")
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.file.name))
+
+    def test_stale_chunks_are_rejected_before_writing(self):
+        upload = start_upload(self.card, self.user, 'notes.txt', 6)
+        stale = AttachmentUpload.objects.get(pk=upload.pk)
+        append_chunk(upload, 0, BytesIO(b'abc'), 3)
+        with self.assertRaises(OffsetMismatch):
+            append_chunk(stale, 0, BytesIO(b'xyz'), 3)
+        self.assertEqual(stale.received, 3)
+        with open(upload_path(upload), 'rb') as part:
+            self.assertEqual(part.read(), b'abc')
+
+    def test_an_upload_is_finalized_once(self):
+        upload = start_upload(self.card, self.user, 'notes.txt', 3)
+        stale = AttachmentUpload.objects.get(pk=upload.pk)
+        append_chunk(upload, 0, BytesIO(b'abc'), 3)
+        attachment = finalize_upload(upload)
+        with self.assertRaisesMessage(UploadError, 'already finalized'):
+            finalize_upload(stale)
+        self.assertEqual(CardAttachment.objects.get(card=self.card, name='notes.txt'), attachment)
+
+    def test_pending_uploads_are_removed_with_their_cards(self):
+        paths = []
+        for card in (self.card, Card.objects.create(list=self.card.list, name='Other', created_by=self.user)):
+            response = self.client.post('/api/attachments/uploads/', {'card': card.slug, 'name': 'notes.txt',
+                                                                       'size': 10}, format='json')
+            paths.append(upload_path(AttachmentUpload.objects.get(slug=response.data['upload'])))
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/cards/bulk/', [self.card.slug], format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(os.path.exists(paths[0]))
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_list(self.card.list_id)
+        self.assertFalse(AttachmentUpload.objects.exists())
+        self.assertFalse(os.path.exists(paths[1]))
+
+    def test_download_supports_ranges_and_conditional_requests(self):
+        data = b'0123456789' * 10
+        response = self.client.post('/api/attachments/', {'card': self.card.slug, 'file': SimpleUploadedFile(
+            'notes.txt', data)}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/attachments/{response.data['slug']}/download/"
+
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (200, data))
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(data).hexdigest()}"')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertIn('filename="notes.txt"', response['Content-Disposition'])
+
+        response = self.client.get(url, headers={'Range': 'bytes=10-19', 'If-Range': response['ETag']})
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (206, data[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(self.client.get(url, headers={'Range': 'bytes=-5'}).getvalue(), data[-5:])
+        self.assertEqual(self.client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={'Range': 'bytes=100-'}).status_code, 416)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        with mock.patch('trello.downloads.DOWNLOAD_OFFLOAD', 'x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected-media/blobs/'))
+
+        self.client.force_authenticate(User.objects.create_user(email='eve@example.com', password='x'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class JSONRenderingTests(TrelloTestCase):
+    def test_renderer_and_parser_match_drf_with_and_without_orjson(self):
+        data = {'card': CardSerializer(Card.objects.create(
+            list=List.objects.create(board=self.board, name='List', created_by=self.user), name='Ünïcode \u2028',
+            created_by=self.user)).data, 'comments': CardCommentSerializer(CardComment.objects.all(), many=True).data,
+            'at': self.board.created_at, 1: None}
+        expected = JSONRenderer().render(data)
+        for fallback in (nullcontext(), mock.patch('trello.renderers.orjson', None)):
+            with fallback:
+                self.assertEqual(FastJSONRenderer().render(data), expected)
+                self.assertEqual(b''.join(iter_json(data, chunk_size=16)), expected)
+                self.assertEqual(FastJSONParser().parse(BytesIO(expected)), json.loads(expected))
+        response = self.client.post('/api/comments/', b'{"card":', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_large_responses_are_streamed_and_compressed(self):
+        self.create_cards(4)
+        with mock.patch('trello.renderers.STREAM_MIN_ITEMS', 3):
+            response = self.client.get('/api/cards/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        body = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([card['slug'] for card in body['results']],
+                         list(Card.objects.order_by('-id').values_list('slug', flat=True)))
+        response = self.client.get('/api/cards/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        small = self.client.get('/api/boards/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(small.streaming)
+
+        with mock.patch('trello.renderers.STREAM_MIN_ITEMS', 3):
+            page = self.client.get('/api/cards/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(page['Content-Type'].partition(';')[0], 'text/html')
+        self.assertFalse(page.has_header('Content-Encoding'))
+
+
+class RequestMetricsTests(TrelloTestCase):
+    def test_server_timing_and_slow_request_log(self):
+        self.create_cards(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/cards/')
+        query_count = len(queries)
+        self.assertIn(f'desc="{query_count} queries"', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+
+        cache.clear()
+        with mock.patch('trello.middleware.SLOW_REQUEST_QUERIES', 1), self.assertLogs('trello.requests') as logs:
+            self.client.get('/api/cards/')
+        record, = logs.records
+        self.assertEqual((record.route, record.queries), ('card-list', query_count))
+
+
+class ProfilingTests(TrelloTestCase):
+    def test_sampled_profiles_are_aggregated_per_endpoint(self):
+        profile_store.reset()
+        self.addCleanup(profile_store.reset)
+        self.create_cards(2)
+        with mock.patch('trello.profiling.PROFILE_SAMPLE_RATE', 1.0), \
+                mock.patch('trello.profiling.PROFILE_ROUTES', frozenset({'card-list'})):
+            for url in ('/api/cards/', '/api/cards/', '/api/lists/'):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        summary = self.client.get('/api/profiles/').json()
+        self.assertEqual([(entry['endpoint'], entry['samples']) for entry in summary], [('card-list.get', 2)])
+        response = self.client.get('/api/profiles/card-list.get/')
+        with tempfile.NamedTemporaryFile() as dump:
+            dump.write(response.content)
+            dump.flush()
+            functions = {function for _, _, function in pstats.Stats(dump.name).stats}
+        self.assertIn('to_representation', functions)
+
+    def test_sync_views_are_profiled_under_asgi(self):
+        profile_store.reset()
+        self.addCleanup(profile_store.reset)
+        self.create_cards(1)
+        token = UserRefreshToken.for_user(self.user).access_token
+        with mock.patch('trello.profiling.PROFILE_SAMPLE_RATE', 1.0):
+            response = async_to_sync(self.async_client.get)('/api/cards/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        functions = {function for _, _, function in profile_store.profiles['card-list.get'][0].stats}
+        # The view, DRF's rendering and the middleware below this one all run under the profiler.
+        self.assertTrue({'to_representation', 'render', 'process_view'} <= functions, functions)
+
+
+class BenchmarkTests(TestCase):
+    def test_scale_data_and_baseline_comparison(self):
+        created = generate_scale_data(users=4, boards=2, lists=2, cards=3, members=3, comments=1, tags=1)
+        self.assertEqual((Card.objects.count(), BoardMember.objects.count()), (created['cards'], 6))
+        self.assertEqual(set(Card.objects.values_list('board_id', flat=True)),
+                         set(Board.objects.values_list('id', flat=True)))
+
+        results = run_benchmarks(iterations=2, warmup=0, names={'cards.list', 'boards.snapshot', 'auth.login'})
+        self.assertEqual({name: result['status'] for name, result in results.items()},
+                         {'cards.list': 200, 'boards.snapshot': 200, 'auth.login': 200})
+        # Timed reads bypass the response cache; warm reads are served from it.
+        self.assertGreater(results['cards.list']['queries'], results['cards.list']['warm_queries'])
+        self.assertNotIn('warm_p50_ms', results['auth.login'])
+        self.assertEqual(compare_to_baseline(results, results), [])
+        baseline = {'cards.list': {**results['cards.list'], 'queries': results['cards.list']['queries'] - 1}}
+        self.assertEqual(len(compare_to_baseline(results, baseline)), 1)
+
+    def test_serializer_and_encoding_benchmarks_check_identical_output(self):
+        generate_scale_data(users=3, boards=1, lists=2, cards=3, members=2, comments=1, tags=0)
+        results = benchmark_serializers(limit=5, repeat=1)
+        self.assertEqual(set(results), {'lists', 'cards', 'comments'})
+        self.assertTrue(all(result['identical'] for result in results.values()))
+        encoding = benchmark_encoding(repeat=1)
+        self.assertTrue(all(result['identical'] and result['gzip_bytes'] < result['bytes']
+                            for result in encoding.values()))
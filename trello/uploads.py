@@ -0,0 +1,121 @@
+"""
+Resumable chunked attachment uploads.
+
+An upload is started with its total size, receives chunks appended at the offset the server reports, and is
+finalized into a content-addressed blob. Chunks are spooled to a temporary file, never holding more than
+``READ_CHUNK_SIZE`` bytes in memory, and appended under a short row lock; an interrupted client resumes from
+the stored offset.
+"""
+import hashlib
+import os
+import secrets
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import READ_CHUNK_SIZE, store_local_file
+from .models import AttachmentUpload, CardAttachment
+
+UPLOAD_TEMP_DIR = settings.TRELLO_UPLOAD_TEMP_DIR
+UPLOAD_MAX_SIZE = settings.TRELLO_UPLOAD_MAX_SIZE
+UPLOAD_MAX_CHUNK_SIZE = settings.TRELLO_UPLOAD_MAX_CHUNK_SIZE
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"Upload continues at offset {offset}.")
+        self.offset = offset
+
+
+def upload_path(upload):
+    return os.path.join(UPLOAD_TEMP_DIR, f'{upload.slug}.part')
+
+
+def start_upload(card, user, name, size):
+    if size > UPLOAD_MAX_SIZE:
+        raise UploadError(f"Uploads are limited to {UPLOAD_MAX_SIZE} bytes.")
+    upload = AttachmentUpload.objects.create(card=card, user=user, name=name, size=size)
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    open(upload_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Writes ``length`` bytes read from ``stream`` at ``offset``, which must be the number of bytes received so far.
+    """
+    if length > UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f"Chunks are limited to {UPLOAD_MAX_CHUNK_SIZE} bytes.")
+    if offset != upload.received:
+        raise OffsetMismatch(upload.received)
+    if offset + length > upload.size:
+        raise UploadError("Chunk exceeds the declared upload size.")
+    # The client may send slowly, so the chunk is spooled before the row is locked.
+    with tempfile.TemporaryFile(dir=UPLOAD_TEMP_DIR) as chunk:
+        written = 0
+        while written < length:
+            data = stream.read(min(READ_CHUNK_SIZE, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            written += len(data)
+        chunk.seek(0)
+        # The row stays locked while the chunk is appended, so concurrent requests for the same offset cannot
+        # both touch the file: the second one sees the advanced offset and is turned away before writing.
+        with transaction.atomic():
+            received = AttachmentUpload.objects.select_for_update().filter(pk=upload.pk) \
+                .values_list('received', flat=True).first()
+            if received is None:
+                raise UploadError("The upload was discarded.")
+            if offset != received:
+                upload.received = received
+                raise OffsetMismatch(received)
+            with open(upload_path(upload), 'r+b') as target:
+                target.seek(offset)
+                shutil.copyfileobj(chunk, target, READ_CHUNK_SIZE)
+                target.truncate()
+            AttachmentUpload.objects.filter(pk=upload.pk).update(received=offset + written, updated_at=timezone.now())
+    upload.received = offset + written
+    return upload
+
+
+def finalize_upload(upload, sha256=None):
+    with transaction.atomic():
+        # Locking the row makes a second finalize of the same upload wait and then find it gone.
+        upload = AttachmentUpload.objects.select_for_update().select_related('card').filter(pk=upload.pk).first()
+        if upload is None:
+            raise UploadError("The upload was already finalized or discarded.")
+        if upload.received != upload.size:
+            raise UploadError(f"Upload is incomplete: {upload.received} of {upload.size} bytes received.")
+        path = upload_path(upload)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        if sha256 and not secrets.compare_digest(sha256.lower(), digest):
+            raise UploadError("Checksum does not match the uploaded data.")
+        blob = store_local_file(path, digest)
+        attachment = CardAttachment.objects.create(card=upload.card, file=blob.file.name, name=upload.name,
+                                                   blob=blob)
+        upload.delete()
+    return attachment
+
+
+def delete_upload_files(slugs):
+    for slug in slugs:
+        path = os.path.join(UPLOAD_TEMP_DIR, f'{slug}.part')
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def discard_upload(upload):
+    delete_upload_files([upload.slug])
+    upload.delete()
@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import BoardViewSet, ListViewSet, CardViewSet, CardAttachmentViewSet, CardCommentViewSet, CardTagViewSet
+from .streaming import board_events
+from .views import BoardViewSet, ListViewSet, CardViewSet, CardAttachmentViewSet, CardCommentViewSet, CardTagViewSet, \
+    SearchView, ProfileListView, ProfileDetailView
 
 router = DefaultRouter()
 router.register(r'boards', BoardViewSet, "board")
@@ -11,5 +13,9 @@ router.register(r'attachments', CardAttachmentViewSet, "attachment")
 router.register(r'comments', CardCommentViewSet, "comment")
 router.register(r'tags', CardTagViewSet, "tag")
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:endpoint>/', ProfileDetailView.as_view(), name='profile-detail'),
+    path('boards/<slug:slug>/events/', board_events, name='board-events'),
     path('', include(router.urls)),
 ]
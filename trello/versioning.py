@@ -0,0 +1,84 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .membership import member_board_ids
+from .models import Board
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'TRELLO_RESPONSE_CACHE_TIMEOUT', 300)
+
+_cache_bypassed = ContextVar('trello_response_cache_bypassed', default=False)
+
+
+@contextmanager
+def bypass_response_cache():
+    """
+    Renders every response as on a cache miss, without storing it; benchmarks time the uncached read path so.
+    """
+    token = _cache_bypassed.set(True)
+    try:
+        yield
+    finally:
+        _cache_bypassed.reset(token)
+
+
+def board_versions(user):
+    return list(Board.objects.filter(id__in=member_board_ids(user)).order_by('id').values_list('id', 'version'))
+
+
+def make_etag(request, versions):
+    key = repr((request.path, sorted(request.query_params.lists()), versions))
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return False
+    # Weak comparison, as compression turns the ETag into W/"...".
+    etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+    return '*' in etags or etag in etags
+
+
+def response_cache_key(user, etag):
+    return f'trello:response:{user.pk}:{etag}'
+
+
+class BoardVersionETagMixin:
+    """
+    Serves strong ETags derived from board versions and answers matching ``If-None-Match`` requests with
+    a 304 before anything is serialized.
+
+    Response data is also cached per user under the same ETag. Every write to a board or its children bumps
+    the board's version, and membership changes alter the set of versions, so a changed board never maps to
+    an old entry; the timeout only bounds how long unused entries occupy the cache.
+    """
+
+    def conditional_response(self, request, versions, render):
+        etag = make_etag(request, versions)
+        if not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        if _cache_bypassed.get():
+            response = render()
+        else:
+            key = response_cache_key(request.user, etag)
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = render()
+                if response.status_code == status.HTTP_200_OK:
+                    cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, board_versions(request.user),
+                                         lambda: super(BoardVersionETagMixin, self).list(request, *args, **kwargs))
@@ -1,21 +1,70 @@
-from django.core.exceptions import ObjectDoesNotExist
-from rest_framework import viewsets
-from rest_framework.exceptions import PermissionDenied, NotFound
-from rest_framework.permissions import IsAuthenticated
+import os
 
-from .models import CardAttachment, CardComment, CardTag, Card, List, Board, BoardMember, ListMember, CardMember
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .blobs import release_blobs, store_uploaded_file
+from .bulk import BulkModelMixin
+from .changes import stream_changes
+from .copying import copy_board
+from .downloads import serve_file
+from .membership import get_memberships, invalidate_memberships, member_board_ids
+from .models import CardAttachment, CardComment, CardTag, Card, List, Board, BoardChange, BoardMember, ListMember, \
+    CardMember, AttachmentUpload
+from .optimizers import ValuesListMixin, optimize_queryset
+from .pagination import RankedPagination
+from .portability import BoardImporter, export_board
+from .profiling import profile_store
 from .permissions import IsBoardAdmin
+from .purge import purge_list
+from .ranking import key_between, needs_rebalance, rebalance
+from .renderers import StreamingJSONMixin
+from .search import CARD, COMMENT, search
+from .signals import notify_changes
 from .serializers import ListSerializer, CardSerializer, BoardSerializer, CardAttachmentSerializer, \
-    CardCommentSerializer, CardTagSerializer
-
-
-class BoardViewSet(viewsets.ModelViewSet):
+    CardCommentSerializer, CardTagSerializer, ListRowSerializer, CardRowSerializer, CardCommentRowSerializer
+from .snapshots import SNAPSHOT_MAX_DEPTH, build_board_snapshot
+from .uploads import OffsetMismatch, UploadError, append_chunk, discard_upload, finalize_upload, start_upload
+from .versioning import BoardVersionETagMixin
+
+
+def position_between(siblings, before, after):
+    slugs = [slug for slug in (before, after) if slug]
+    if not slugs:
+        return key_between(siblings.aggregate(last=Max('position'))['last'] or None, None)
+    positions = dict(siblings.filter(slug__in=slugs).values_list('slug', 'position'))
+    if len(positions) != len(slugs):
+        raise ValidationError("Neighbours must be siblings of the moved item.")
+    try:
+        return key_between(positions.get(before), positions.get(after))
+    except ValueError:
+        raise ValidationError("'before' must come before 'after'.")
+
+
+def move_to_position(instance, siblings, update_fields):
+    instance.save(update_fields=update_fields)
+    if needs_rebalance(instance.position):
+        rebalance(siblings)
+        Board.bump_version(instance.board_id)
+        instance.refresh_from_db(fields=['position'])
+
+
+class BoardViewSet(StreamingJSONMixin, BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = BoardSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
 
     def get_queryset(self):
-        return Board.objects.filter(members__user=self.request.user, members__is_active=True)
+        queryset = Board.objects.filter(id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -24,19 +73,85 @@ class BoardViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    def perform_destroy(self, instance):
+        # The board disappears right away; purge_deleted_boards removes its rows in batches later.
+        instance.mark_deleted()
+        for user_id in BoardMember.objects.filter(board=instance).values_list('user_id', flat=True):
+            invalidate_memberships(user_id)
+
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             self.permission_classes = [IsAuthenticated, IsBoardAdmin]
         return super().get_permissions()
 
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        return self.conditional_response(request, [(board.pk, board.version)],
+                                         lambda: Response(self.get_serializer(board).data))
+
+    @action(detail=True, methods=['get'])
+    def snapshot(self, request, slug=None):
+        try:
+            depth = int(request.query_params.get('depth', SNAPSHOT_MAX_DEPTH))
+        except ValueError:
+            raise ValidationError({'depth': 'Depth must be an integer.'})
+        if not 0 <= depth <= SNAPSHOT_MAX_DEPTH:
+            raise ValidationError({'depth': f'Depth must be between 0 and {SNAPSHOT_MAX_DEPTH}.'})
+        board = self.get_object()
+        return self.conditional_response(request, [(board.pk, board.version)],
+                                         lambda: Response(build_board_snapshot(board, depth=depth, request=request)))
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, slug=None):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'Cursor must be an integer.'})
+        board = self.get_object()
+        if since < board.changes_pruned_to:
+            return Response({'detail': 'Changes before this cursor were purged; reload the board snapshot.'},
+                            status=status.HTTP_410_GONE)
+        return StreamingHttpResponse(stream_changes(board, since, request), content_type='application/json')
+
+    @action(detail=True, methods=['post'])
+    def copy(self, request, slug=None):
+        board = copy_board(
+            self.get_object(), request.user, name=request.data.get('name'),
+            include_comments=str(request.data.get('include_comments', '')).lower() in ('1', 'true'),
+            include_attachments=str(request.data.get('include_attachments', '')).lower() in ('1', 'true'),
+        )
+        return Response(self.get_serializer(board).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, slug=None):
+        board = self.get_object()
+        response = StreamingHttpResponse(export_board(board), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="board-{board.slug}.ndjson"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_board(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'An NDJSON board export is required.'})
+        importer = BoardImporter(request.user)
+        try:
+            board = importer.run(upload)
+        except ValueError as exc:
+            raise ValidationError({'file': str(exc)})
+        data = {**self.get_serializer(board).data, 'skipped_attachments': importer.skipped_attachments}
+        return Response(data, status=status.HTTP_201_CREATED)
 
-class ListViewSet(viewsets.ModelViewSet):
+
+class ListViewSet(StreamingJSONMixin, ValuesListMixin, BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = ListSerializer
+    values_serializer_class = ListRowSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
 
     def get_queryset(self):
-        return List.objects.filter(board__members__user=self.request.user, board__members__is_active=True)
+        queryset = List.objects.filter(board_id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         try:
@@ -51,26 +166,46 @@ class ListViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    def perform_destroy(self, instance):
+        purge_list(instance.pk)
+        notify_changes([instance], BoardChange.DELETED)
+
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'move']:
             self.permission_classes = [IsAuthenticated, IsBoardAdmin]
         return super().get_permissions()
 
+    @action(detail=True, methods=['post'])
+    def move(self, request, slug=None):
+        board_list = self.get_object()
+        siblings = List.objects.filter(board_id=board_list.board_id).exclude(pk=board_list.pk)
+        board_list.position = position_between(siblings, request.data.get('before'), request.data.get('after'))
+        move_to_position(board_list, List.objects.filter(board_id=board_list.board_id), ['position', 'updated_at'])
+        return Response(self.get_serializer(board_list).data)
+
 
-class CardViewSet(viewsets.ModelViewSet):
+class CardViewSet(StreamingJSONMixin, ValuesListMixin, BulkModelMixin, BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = CardSerializer
+    values_serializer_class = CardRowSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
+    bulk_parent_field = 'list'
+    bulk_parent_model = List
+    bulk_parent_related = ['board']
+    bulk_admin_only = True
+    bulk_delete_cascade = [(CardAttachment, 'card'), (CardComment, 'card'), (CardTag, 'card'), (CardMember, 'card'),
+                           (AttachmentUpload, 'card')]
 
     def get_queryset(self):
-        return Card.objects.filter(list__board__members__user=self.request.user, list__board__members__is_active=True)
+        queryset = Card.objects.filter(board_id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         try:
             list_instance = List.objects.get(slug=self.request.data.get('list'))
         except ObjectDoesNotExist:
             raise NotFound("List not found.")
-        if not list_instance.board.is_admin(self.request.user):
+        if not list_instance.is_admin(self.request.user):
             raise PermissionDenied("You must be an admin to create a card.")
         serializer.save(created_by=self.request.user, list=list_instance)
         CardMember.objects.create(card=serializer.instance, user=self.request.user, is_active=True)
@@ -79,39 +214,155 @@ class CardViewSet(viewsets.ModelViewSet):
         serializer.save()
 
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'move']:
             self.permission_classes = [IsAuthenticated, IsBoardAdmin]
         return super().get_permissions()
 
-
-class CardAttachmentViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'])
+    def move(self, request, slug=None):
+        card = self.get_object()
+        list_instance = card.list
+        if request.data.get('list'):
+            try:
+                list_instance = List.objects.get(slug=request.data.get('list'))
+            except ObjectDoesNotExist:
+                raise NotFound("List not found.")
+            if not list_instance.is_admin(request.user):
+                raise PermissionDenied("You must be an admin to move a card to this list.")
+        siblings = Card.objects.filter(list=list_instance).exclude(pk=card.pk)
+        card.position = position_between(siblings, request.data.get('before'), request.data.get('after'))
+        card.list = list_instance
+        move_to_position(card, Card.objects.filter(list=list_instance), ['list', 'position', 'updated_at'])
+        return Response(self.get_serializer(card).data)
+
+    def build_bulk_instances(self, rows):
+        instances = super().build_bulk_instances(rows)
+        last_positions = dict(Card.objects.filter(list__in={parent for _, parent in rows})
+                              .values('list_id').annotate(last=Max('position')).values_list('list_id', 'last'))
+        for instance in instances:
+            instance.position = last_positions[instance.list_id] = key_between(
+                last_positions.get(instance.list_id) or None, None)
+            instance.created_by = self.request.user
+        return instances
+
+    def after_bulk_create(self, instances):
+        CardMember.objects.bulk_create([CardMember(card=card, user=self.request.user, is_active=True)
+                                        for card in instances])
+
+
+class CardAttachmentViewSet(StreamingJSONMixin, BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = CardAttachmentSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
 
     def get_queryset(self):
-        return CardAttachment.objects.filter(card__list__board__members__user=self.request.user,
-                                             card__list__board__members__is_active=True)
+        queryset = CardAttachment.objects.filter(board_id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         try:
             card_instance = Card.objects.get(slug=self.request.data.get('card'))
         except ObjectDoesNotExist:
             raise NotFound("Card not found.")
-        serializer.save(card=card_instance)
+        uploaded_file = serializer.validated_data.pop('file')
+        blob = store_uploaded_file(uploaded_file)
+        serializer.save(card=card_instance, file=blob.file.name, name=uploaded_file.name, blob=blob)
 
     def perform_update(self, serializer):
-        serializer.save()
+        uploaded_file = serializer.validated_data.pop('file', None)
+        if uploaded_file is None:
+            serializer.save()
+            return
+        previous_blob_id = serializer.instance.blob_id
+        blob = store_uploaded_file(uploaded_file)
+        serializer.save(file=blob.file.name, name=uploaded_file.name, blob=blob)
+        release_blobs([previous_blob_id])
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, slug=None):
+        try:
+            attachment = CardAttachment.objects.select_related('blob') \
+                .get(slug=slug, board_id__in=member_board_ids(request.user))
+        except ObjectDoesNotExist:
+            raise NotFound("Attachment not found.")
+        blob = attachment.blob
+        etag = f'"{blob.sha256}"' if blob else None
+        last_modified = (blob.created_at if blob else attachment.uploaded_at).timestamp()
+        filename = attachment.name or os.path.basename(attachment.file.name)
+        return serve_file(request, attachment.file.name, filename, etag, int(last_modified))
+
+    def get_upload(self, slug):
+        try:
+            return AttachmentUpload.objects.select_related('card').get(slug=slug, user=self.request.user)
+        except ObjectDoesNotExist:
+            raise NotFound("Upload not found.")
 
+    @staticmethod
+    def upload_state(upload, status_code=status.HTTP_200_OK):
+        data = {'upload': upload.slug, 'name': upload.name, 'size': upload.size, 'offset': upload.received}
+        return Response(data, status=status_code, headers={'Upload-Offset': str(upload.received)})
 
-class CardCommentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def uploads(self, request):
+        try:
+            card = Card.objects.get(slug=request.data.get('card'), board_id__in=member_board_ids(request.user))
+        except ObjectDoesNotExist:
+            raise NotFound("Card not found.")
+        name = request.data.get('name')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = -1
+        if not name or size < 0:
+            raise ValidationError("Both 'name' and a non-negative 'size' are required.")
+        try:
+            upload = start_upload(card, request.user, name, size)
+        except UploadError as e:
+            raise ValidationError(str(e))
+        return self.upload_state(upload, status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_slug>[^/.]+)')
+    def upload(self, request, upload_slug=None):
+        upload = self.get_upload(upload_slug)
+        if request.method == 'DELETE':
+            discard_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if request.method == 'PUT':
+            try:
+                offset = int(request.headers.get('Upload-Offset', ''))
+                length = int(request.headers.get('Content-Length', ''))
+            except ValueError:
+                raise ValidationError("Chunks need 'Upload-Offset' and 'Content-Length' headers.")
+            try:
+                append_chunk(upload, offset, request.stream, length)
+            except OffsetMismatch:
+                return self.upload_state(upload, status.HTTP_409_CONFLICT)
+            except UploadError as e:
+                raise ValidationError(str(e))
+        return self.upload_state(upload)
+
+    @action(detail=False, methods=['post'], url_path=r'uploads/(?P<upload_slug>[^/.]+)/finalize')
+    def finalize(self, request, upload_slug=None):
+        upload = self.get_upload(upload_slug)
+        try:
+            attachment = finalize_upload(upload, request.data.get('sha256'))
+        except UploadError as e:
+            raise ValidationError(str(e))
+        return Response(self.get_serializer(attachment).data, status=status.HTTP_201_CREATED)
+
+
+class CardCommentViewSet(StreamingJSONMixin, ValuesListMixin, BulkModelMixin, BoardVersionETagMixin,
+                         viewsets.ModelViewSet):
     serializer_class = CardCommentSerializer
+    values_serializer_class = CardCommentRowSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
+    bulk_parent_field = 'card'
+    bulk_parent_model = Card
 
     def get_queryset(self):
-        return CardComment.objects.filter(card__list__board__members__user=self.request.user,
-                                          card__list__board__members__is_active=True)
+        queryset = CardComment.objects.filter(board_id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         try:
@@ -123,15 +374,23 @@ class CardCommentViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    def build_bulk_instances(self, rows):
+        instances = super().build_bulk_instances(rows)
+        for instance in instances:
+            instance.user = self.request.user
+        return instances
+
 
-class CardTagViewSet(viewsets.ModelViewSet):
+class CardTagViewSet(StreamingJSONMixin, BulkModelMixin, BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = CardTagSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'slug'
+    bulk_parent_field = 'card'
+    bulk_parent_model = Card
 
     def get_queryset(self):
-        return CardTag.objects.filter(card__list__board__members__user=self.request.user,
-                                      card__list__board__members__is_active=True)
+        queryset = CardTag.objects.filter(board_id__in=member_board_ids(self.request.user))
+        return optimize_queryset(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         try:
@@ -142,3 +401,53 @@ class CardTagViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         serializer.save()
+
+
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'A search query is required.'})
+        paginator = RankedPagination()
+        board_ids = get_memberships(request.user).keys()
+        rows = paginator.paginate(lambda offset, limit: search(query, board_ids, offset, limit), request)
+        ids = {CARD: [], COMMENT: []}
+        for kind, object_id, rank in rows:
+            ids[kind].append(object_id)
+        objects = {
+            CARD: optimize_queryset(Card.objects.filter(id__in=ids[CARD]), CardSerializer).in_bulk(),
+            COMMENT: optimize_queryset(CardComment.objects.filter(id__in=ids[COMMENT]),
+                                       CardCommentSerializer).in_bulk(),
+        }
+        serializer_classes = {CARD: CardSerializer, COMMENT: CardCommentSerializer}
+        results = [{
+            'type': kind,
+            'rank': rank,
+            kind: serializer_classes[kind](objects[kind][object_id], context={'request': request}).data,
+        } for kind, object_id, rank in rows if object_id in objects[kind]]
+        return paginator.get_paginated_response(results)
+
+
+class ProfileListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(profile_store.summary())
+
+    def delete(self, request):
+        profile_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileDetailView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, endpoint):
+        data = profile_store.dump(endpoint)
+        if data is None:
+            raise NotFound("No profile for this endpoint.")
+        response = HttpResponse(data, content_type='application/octet-stream')
+        response['Content-Disposition'] = content_disposition_header(True, f'{endpoint}.pstats')
+        return response
@@ -0,0 +1,27 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import StatelessUser
+from .tokens import USER_CLAIMS
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates with a JWT without loading the user row.
+
+    ``request.user`` is a ``StatelessUser`` built from the token's id, slug, is_active and is_staff claims; any
+    other field is loaded on first access. Tokens issued before these claims existed fall back to a lookup.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN or any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return StatelessUser.from_claims(user_id, validated_token)
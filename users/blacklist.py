@@ -0,0 +1,128 @@
+"""
+Refresh token blacklist lookups without a query per refresh.
+
+Each process keeps a Bloom filter of the jtis of blacklisted, unexpired tokens. A token the filter has never
+seen is not blacklisted; only possible hits are confirmed against ``BlacklistedToken``. New blacklist entries
+bump a generation counter in the cache, and a process that sees a new generation adds the rows blacklisted
+since its last look, less ``BLACKLIST_CATCH_UP_MARGIN`` seconds, to its filter. The margin covers rows that
+commit out of order or after a clock skew between processes; adding a jti twice is harmless. Filters are
+rebuilt from scratch every ``BLACKLIST_FILTER_MAX_AGE`` seconds to shed expired tokens.
+
+Processes only learn about each other's blacklist entries through the cache, so the filter is skipped, and
+every check queried, while the default cache is process-local (local memory or dummy). ``BLACKLIST_FILTER``
+set to ``True`` or ``False`` overrides that, for example for a single-process deployment.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .bloom import BloomFilter
+
+BLACKLIST_FILTER_MAX_AGE = getattr(settings, 'BLACKLIST_FILTER_MAX_AGE', 300)
+BLACKLIST_FILTER_ERROR_RATE = getattr(settings, 'BLACKLIST_FILTER_ERROR_RATE', 0.001)
+BLACKLIST_CATCH_UP_MARGIN = getattr(settings, 'BLACKLIST_CATCH_UP_MARGIN', 60)
+TOKEN_PURGE_BATCH_SIZE = getattr(settings, 'TOKEN_PURGE_BATCH_SIZE', 1000)
+BLACKLIST_FILTER = getattr(settings, 'BLACKLIST_FILTER', None)
+
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+GENERATION_KEY = 'users:blacklist:generation'
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_seen = None
+        self.generation = None
+        self.built_at = 0
+
+    def rebuild(self, generation):
+        # Taken before reading, so rows committed meanwhile are picked up by the next catch-up.
+        started = timezone.now()
+        rows = list(BlacklistedToken.objects.filter(token__expires_at__gt=started)
+                    .values_list('token__jti', flat=True))
+        # Leave room for the entries added until the next rebuild.
+        self.bloom = BloomFilter.for_capacity(max(len(rows) * 2, 1024), BLACKLIST_FILTER_ERROR_RATE)
+        self.bloom.update(rows)
+        self.last_seen, self.generation, self.built_at = started, generation, time.monotonic()
+
+    def catch_up(self, generation):
+        started = timezone.now()
+        since = self.last_seen - timedelta(seconds=BLACKLIST_CATCH_UP_MARGIN)
+        self.bloom.update(BlacklistedToken.objects.filter(blacklisted_at__gte=since)
+                          .values_list('token__jti', flat=True))
+        self.last_seen, self.generation = started, generation
+
+    def might_contain(self, jti):
+        generation = cache.get(GENERATION_KEY)
+        with self.lock:
+            if self.bloom is None or time.monotonic() - self.built_at > BLACKLIST_FILTER_MAX_AGE:
+                self.rebuild(generation)
+            elif generation != self.generation:
+                self.catch_up(generation)
+            return jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def filter_enabled():
+    if BLACKLIST_FILTER is not None:
+        return BLACKLIST_FILTER
+    # A process-local cache never carries other processes' generation bumps.
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_CACHES)
+
+
+def is_blacklisted(jti):
+    if filter_enabled() and not blacklist_filter.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def blacklisted(jti):
+    """
+    Announces a new blacklist entry to every process once the transaction that created it commits.
+    """
+    blacklist_filter.add(jti)
+    transaction.on_commit(_bump_generation)
+
+
+def _bump_generation():
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def purge_expired_tokens(batch_size=TOKEN_PURGE_BATCH_SIZE):
+    """
+    Deletes expired outstanding tokens, and their blacklist entries, in bounded batches. Returns the number of
+    outstanding tokens deleted.
+    """
+    deleted = 0
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            ids = list(OutstandingToken.objects.filter(expires_at__lte=now).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            blacklisted_tokens = BlacklistedToken.objects.filter(token_id__in=ids)
+            blacklisted_tokens._raw_delete(blacklisted_tokens.db)
+            outstanding = OutstandingToken.objects.filter(id__in=ids)
+            deleted += outstanding._raw_delete(outstanding.db)
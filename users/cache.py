@@ -0,0 +1,39 @@
+"""
+Short-lived cache of user rows, shared by token-built users and token refreshes.
+
+Entries are dropped whenever a user is saved or deleted, and expire after ``USER_CACHE_TIMEOUT`` seconds
+so changes made behind the ORM's back (``QuerySet.update``) are picked up soon after.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60)
+
+# The password hash never leaves the database.
+UNCACHED_FIELDS = {'password'}
+
+
+def _cache_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def cached_fields():
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+
+
+def get_user_values(user_id):
+    """
+    Returns a dict of the user's column values, or ``None`` when the user does not exist.
+    """
+    key = _cache_key(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = get_user_model()._default_manager.filter(pk=user_id).values(*cached_fields()).first()
+        if values is not None:
+            cache.set(key, values, USER_CACHE_TIMEOUT)
+    return values
+
+
+def invalidate_user(user_id):
+    cache.delete(_cache_key(user_id))
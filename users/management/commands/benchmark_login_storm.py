@@ -0,0 +1,69 @@
+import asyncio
+import time
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from users.models import User
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000 if samples else 0.0
+
+
+class Command(BaseCommand):
+    help = ('Measures /api/ latency while a burst of logins runs, through the ASGI URL configuration with '
+            'offloaded password hashing (default) or the plain sync views (--sync-logins).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--samples', type=int, default=50)
+        parser.add_argument('--sync-logins', action='store_true')
+
+    def handle(self, *args, **options):
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(email=f'bench-{uuid.uuid4().hex[:12]}@example.com', password=password,
+                                        first_name='Bench', sur_name='User')
+        urlconf = settings.ROOT_URLCONF if options['sync_logins'] else 'apps.asgi_urls'
+        try:
+            with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                baseline, during, statuses = async_to_sync(self.run)(user, password, options)
+        finally:
+            user.delete()
+        for label, samples in (('idle', baseline), ('login storm', during)):
+            self.stdout.write(f'/api/boards/ {label}: p50 {percentile(samples, 0.5):.1f} ms, '
+                              f'p95 {percentile(samples, 0.95):.1f} ms, max {percentile(samples, 1):.1f} ms')
+        self.stdout.write('Logins: ' + ', '.join(f'{count} x {code}' for code, count in sorted(statuses.items())))
+
+    async def run(self, user, password, options):
+        client = AsyncClient()
+        access = (await sync_to_async(user.tokens)())['access']
+        headers = {'Authorization': f'Bearer {access}'}
+
+        async def sample_api(count):
+            samples = []
+            for _ in range(count):
+                started = time.perf_counter()
+                await client.get('/api/boards/', headers=headers)
+                samples.append(time.perf_counter() - started)
+            return samples
+
+        baseline = await sample_api(options['samples'])
+        statuses = {}
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def login():
+            async with semaphore:
+                response = await client.post('/auth/login', {'email': user.email, 'password': password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        storm = asyncio.gather(*(login() for _ in range(options['logins'])))
+        await asyncio.sleep(0.05)
+        during = await sample_api(options['samples'])
+        await storm
+        return baseline, during, statuses
@@ -1,9 +1,11 @@
 import uuid
 
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
-from django.db import models
+from django.db import models, router
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import get_user_values, invalidate_user
+from .tokens import USER_CLAIMS, UserRefreshToken
 
 
 # Create your models here.
@@ -64,10 +66,43 @@ class User(AbstractBaseUser, PermissionsMixin):
         if not self.slug:
             self.slug = str(uuid.uuid4())
         super().save(*args, **kwargs)
+        invalidate_user(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        deleted = super().delete(*args, **kwargs)
+        invalidate_user(user_id)
+        return deleted
 
     def tokens(self):
-        refresh = RefreshToken.for_user(self)
+        refresh = UserRefreshToken.for_user(self)
         return {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
         }
+
+
+class StatelessUser(User):
+    """
+    A user built from access token claims. Fields missing from the token are deferred and, the first time one
+    of them is read, loaded together from the user cache instead of one query per field.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, claims):
+        field_names = ['id', *USER_CLAIMS]
+        return cls.from_db(router.db_for_read(cls), field_names, [user_id, *(claims[claim] for claim in USER_CLAIMS)])
+
+    def refresh_from_db(self, using=None, fields=None):
+        deferred = self.get_deferred_fields()
+        if fields is None or not deferred.issuperset(fields):
+            return super().refresh_from_db(using=using, fields=fields)
+        values = get_user_values(self.pk) or {}
+        for attname in deferred.intersection(values):
+            setattr(self, attname, values[attname])
+        missing = [attname for attname in fields if attname not in values]
+        if missing:
+            super().refresh_from_db(using=using, fields=missing)
@@ -0,0 +1,82 @@
+"""
+Runs password-hashing views on a small dedicated thread pool.
+
+PBKDF2 is deliberately slow; on the request threads a burst of logins would occupy every worker and stall
+``/api/`` traffic. Under ASGI, ``offload`` wraps a sync view so it runs on ``hashing_executor`` instead, while
+the event loop keeps serving other requests. Requests beyond ``AUTH_HASHING_WORKERS`` running plus
+``AUTH_HASHING_QUEUE_DEPTH`` waiting are turned away at once with a 429 rather than queued without bound.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+AUTH_HASHING_WORKERS = getattr(settings, 'AUTH_HASHING_WORKERS', min(4, os.cpu_count() or 1))
+AUTH_HASHING_QUEUE_DEPTH = getattr(settings, 'AUTH_HASHING_QUEUE_DEPTH', 32)
+AUTH_HASHING_RETRY_AFTER = 1
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    def __init__(self, workers, queue_depth, name):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    @staticmethod
+    def call(func, args, kwargs):
+        # Pool threads live outside the request cycle, so they manage their own connections.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def run(self, func, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            raise ExecutorSaturated()
+        # The caller's context carries per-request state such as the query metrics into the pool thread.
+        context = contextvars.copy_context()
+        try:
+            future = self.executor.submit(context.run, self.call, func, args, kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+
+hashing_executor = BoundedExecutor(AUTH_HASHING_WORKERS, AUTH_HASHING_QUEUE_DEPTH, 'auth-hashing')
+
+
+def render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def offload(view, executor=hashing_executor):
+    """
+    Returns an async view running the sync ``view`` on ``executor``, or answering 429 when it is saturated.
+    """
+    @csrf_exempt
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        try:
+            return await executor.run(render_view, view, request, *args, **kwargs)
+        except ExecutorSaturated:
+            response = JsonResponse({'detail': 'Too many authentication requests, please retry shortly.'},
+                                    status=429)
+            response['Retry-After'] = str(AUTH_HASHING_RETRY_AFTER)
+            return response
+    return async_view
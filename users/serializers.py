@@ -2,7 +2,10 @@ from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.tokens import TokenError
+
+from .tokens import UserRefreshToken
 
 User = get_user_model()
 
@@ -60,6 +63,10 @@ class LoginSerializer(serializers.ModelSerializer):
         }
 
 
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = UserRefreshToken
+
+
 class LogoutSerializer(serializers.Serializer):
     refresh_token = serializers.CharField()
 
@@ -73,7 +80,7 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            token = RefreshToken(self.token)
+            token = UserRefreshToken(self.token)
             token.blacklist()
         except TokenError:
             self.fail('bad_token')
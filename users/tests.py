@@ -1,3 +1,170 @@
-from django.test import TestCase
+import asyncio
+import re
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.http import JsonResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .blacklist import _bump_generation, blacklist_filter, filter_enabled, is_blacklisted, purge_expired_tokens
+from .bloom import BloomFilter
+from .models import User, StatelessUser
+from .offload import BoundedExecutor, offload
+from .tokens import UserRefreshToken
+
+
+class StatelessAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='owner@example.com', password='secret123', first_name='Ada',
+                                             sur_name='Lovelace')
+        self.client = APIClient()
+        response = self.client.post('/auth/login', {'email': 'owner@example.com', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        self.access, self.refresh = response.data['access_token'], response.data['refresh_token']
+
+    def test_users_are_built_from_token_claims(self):
+        claims = AccessToken(self.access)
+        self.assertEqual((claims['slug'], claims['is_active'], claims['is_staff']), (self.user.slug, True, False))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/boards/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'users_user' in query['sql']])
+
+    def test_deferred_fields_load_together_from_the_cache(self):
+        cache.clear()
+        user = StatelessUser.from_claims(self.user.pk, {'slug': self.user.slug, 'is_active': True, 'is_staff': False})
+        with self.assertNumQueries(1):
+            self.assertEqual((user.email, user.full_name), ('owner@example.com', 'Ada Lovelace'))
+            self.assertFalse(user.is_superuser)
+        user = StatelessUser.from_claims(self.user.pk, {'slug': self.user.slug, 'is_active': True, 'is_staff': False})
+        with self.assertNumQueries(0):
+            self.assertEqual(user.email, 'owner@example.com')
+
+    def test_refresh_restamps_claims(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post('/auth/token/refresh', {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post('/auth/token/refresh', {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.bloom = None
+        # The tests run in one process, where the local memory cache is shared by everything.
+        patcher = mock.patch('users.blacklist.BLACKLIST_FILTER', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='owner@example.com', password='secret123', first_name='Ada',
+                                             sur_name='Lovelace')
+        self.client = APIClient()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        bloom.update(str(index) for index in range(1000))
+        self.assertTrue(all(str(index) in bloom for index in range(1000)))
+        self.assertLess(sum(str(index) in bloom for index in range(1000, 11000)), 300)
+
+    def test_refresh_checks_blacklist_without_a_query(self):
+        refresh = self.user.tokens()['refresh']
+        self.assertFalse(is_blacklisted('warm-up'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/auth/token/refresh', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        # Rotation still records the old token; only the membership check is skipped.
+        self.assertFalse([query for query in queries if 'INNER JOIN' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/auth/logout', {'refresh_token': response.data['refresh']})
+                             .status_code, 200)
+        self.assertEqual(self.client.post('/auth/token/refresh', {'refresh': refresh}).status_code, 401)
+        self.assertEqual(self.client.post('/auth/token/refresh', {'refresh': response.data['refresh']})
+                         .status_code, 401)
+
+    def test_entries_from_other_processes_are_picked_up(self):
+        refresh = UserRefreshToken.for_user(self.user)
+        self.assertFalse(is_blacklisted(refresh['jti']))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        self.assertFalse(is_blacklisted(refresh['jti']))
+        _bump_generation()
+        self.assertTrue(is_blacklisted(refresh['jti']))
+
+    def test_entries_committed_out_of_id_order_are_picked_up(self):
+        late, early = UserRefreshToken.for_user(self.user), UserRefreshToken.for_user(self.user)
+        self.assertFalse(is_blacklisted(late['jti']))
+        BlacklistedToken.objects.create(id=100, token=OutstandingToken.objects.get(jti=early['jti']))
+        _bump_generation()
+        self.assertTrue(is_blacklisted(early['jti']))
+        # A transaction holding a lower id commits after the filter has seen a higher one.
+        BlacklistedToken.objects.create(id=50, token=OutstandingToken.objects.get(jti=late['jti']))
+        _bump_generation()
+        self.assertTrue(is_blacklisted(late['jti']))
+
+    def test_process_local_caches_check_the_database(self):
+        refresh = UserRefreshToken.for_user(self.user)
+        self.assertFalse(is_blacklisted(refresh['jti']))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        with mock.patch('users.blacklist.BLACKLIST_FILTER', None):
+            self.assertTrue(is_blacklisted(refresh['jti']))
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                                       'LOCATION': 'cache'}}):
+                self.assertTrue(filter_enabled())
+
+    def test_purge_expired_tokens(self):
+        for _ in range(3):
+            UserRefreshToken.for_user(self.user).blacklist()
+        OutstandingToken.objects.filter(pk__in=OutstandingToken.objects.order_by('id').values('id')[:2]) \
+            .update(expires_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(purge_expired_tokens(batch_size=1), 2)
+        self.assertEqual((OutstandingToken.objects.count(), BlacklistedToken.objects.count()), (1, 1))
+
+
+@override_settings(ROOT_URLCONF='apps.asgi_urls')
+class OffloadedLoginTests(TransactionTestCase):
+    def test_login_runs_on_the_hashing_pool(self):
+        User.objects.create_user(email='owner@example.com', password='secret123', first_name='Ada', sur_name='Lovelace')
+        response = async_to_sync(AsyncClient().post)('/auth/login', {'email': 'owner@example.com',
+                                                                     'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.json())
+        # Queries on the pool thread count towards the request.
+        queries = re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1)
+        self.assertGreater(int(queries), 0)
+
+    def test_saturated_pool_rejects_immediately(self):
+        release = threading.Event()
+
+        def slow_view(request):
+            release.wait(5)
+            return JsonResponse({})
+
+        view = offload(slow_view, BoundedExecutor(1, 1, 'test-hashing'))
+        request = RequestFactory().post('/auth/login')
+
+        async def storm():
+            running = [asyncio.ensure_future(view(request)) for _ in range(2)]
+            await asyncio.sleep(0)
+            rejected = await view(request)
+            release.set()
+            return rejected, await asyncio.gather(*running)
+
+        rejected, completed = async_to_sync(storm)()
+        self.assertEqual((rejected.status_code, rejected['Retry-After']), (429, '1'))
+        self.assertEqual([response.status_code for response in completed], [200, 200])
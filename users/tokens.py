@@ -0,0 +1,46 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklisted, is_blacklisted
+from .cache import get_user_values
+
+USER_CLAIMS = ('slug', 'is_active', 'is_staff')
+
+
+def user_claims(values):
+    return {claim: values[claim] for claim in USER_CLAIMS}
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    A refresh token whose access tokens carry the claims ``StatelessJWTAuthentication`` builds users from.
+
+    Claims are re-read from the (cached) user row whenever an access token is issued, so deactivation and
+    role changes reach clients within one access token lifetime. Blacklist checks go through the in-process
+    filter in ``users.blacklist`` and, with a shared cache, only query the database for possible hits.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklisted(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.payload.update(user_claims(vars(user)))
+        return token
+
+    @property
+    def access_token(self):
+        values = get_user_values(self.payload.get(api_settings.USER_ID_CLAIM))
+        if values is None or not values['is_active']:
+            raise TokenError('User is inactive or no longer exists.')
+        self.payload.update(user_claims(values))
+        return super().access_token